@@ -5,6 +5,9 @@ from sqlalchemy import pool
 
 from alembic import context
 from app.db.models.assignment import Base as AssignmentBase
+from app.db.models import summary  # noqa: F401 - registers summary_cache on the shared metadata
+from app.db.models import quiz_store  # noqa: F401 - registers quiz_store and quiz_store_items on the shared metadata
+from app.db.models import chatbot  # noqa: F401 - registers chatbot_configs on the shared metadata
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
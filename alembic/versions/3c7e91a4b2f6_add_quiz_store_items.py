@@ -0,0 +1,89 @@
+"""Add quiz_store_items table
+
+Revision ID: 3c7e91a4b2f6
+Revises: e5a92c7f3d18
+Create Date: 2026-10-18 19:12:40.551207
+
+"""
+import uuid
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c7e91a4b2f6'
+down_revision: Union[str, None] = 'e5a92c7f3d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+quiz_store = sa.table(
+    'quiz_store',
+    sa.column('namespace', sa.String()),
+    sa.column('key', sa.String()),
+    sa.column('value', sa.JSON())
+)
+
+
+def upgrade():
+    quiz_store_items = op.create_table(
+        'quiz_store_items',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('namespace', sa.String(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('item_key', sa.String(), nullable=False),
+        sa.Column('value', sa.JSON(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('namespace', 'key', 'item_key', name='uq_quiz_store_items_item')
+    )
+    op.create_index('ix_quiz_store_items_namespace_key', 'quiz_store_items', ['namespace', 'key'])
+
+    # Student responses used to be one JSON list per session; split them into rows
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(quiz_store.c.key, quiz_store.c.value).where(quiz_store.c.namespace == 'student_responses')
+    ).all()
+    items = []
+    for key, value in rows:
+        for item in value if isinstance(value, list) else []:
+            student_id = item.get('student_id') if isinstance(item, dict) else None
+            items.append({
+                'namespace': 'student_responses',
+                'key': key,
+                'item_key': str(student_id) if student_id else uuid.uuid4().hex,
+                'value': item
+            })
+    # Keep the last response per student, as appends do now
+    items = list({(item['key'], item['item_key']): item for item in items}.values())
+    if items:
+        op.bulk_insert(quiz_store_items, items)
+    op.execute(quiz_store.delete().where(quiz_store.c.namespace == 'student_responses'))
+
+
+def downgrade():
+    quiz_store_items = sa.table(
+        'quiz_store_items',
+        sa.column('id', sa.Integer()),
+        sa.column('namespace', sa.String()),
+        sa.column('key', sa.String()),
+        sa.column('value', sa.JSON())
+    )
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(quiz_store_items.c.namespace, quiz_store_items.c.key, quiz_store_items.c.value)
+        .order_by(quiz_store_items.c.id)
+    ).all()
+    lists = {}
+    for namespace, key, value in rows:
+        lists.setdefault((namespace, key), []).append(value)
+    if lists:
+        op.bulk_insert(quiz_store, [
+            {'namespace': namespace, 'key': key, 'value': value}
+            for (namespace, key), value in lists.items()
+        ])
+
+    op.drop_index('ix_quiz_store_items_namespace_key', table_name='quiz_store_items')
+    op.drop_table('quiz_store_items')
@@ -0,0 +1,34 @@
+"""Add expires_at to summary_cache
+
+Revision ID: 6a1d8e3f5c27
+Revises: 9f4d2b6e8a31
+Create Date: 2026-10-18 21:05:37.614920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a1d8e3f5c27'
+down_revision: Union[str, None] = '9f4d2b6e8a31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.add_column('summary_cache', sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True))
+    # Existing rows get the default 30 days from when they were written
+    op.execute(
+        "UPDATE summary_cache "
+        "SET expires_at = COALESCE(created_at, now()) + interval '30 days'"
+    )
+    op.alter_column('summary_cache', 'expires_at', nullable=False)
+    op.create_index('ix_summary_cache_expires_at', 'summary_cache', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_summary_cache_expires_at', table_name='summary_cache')
+    op.drop_column('summary_cache', 'expires_at')
@@ -0,0 +1,36 @@
+"""Add summary_cache table
+
+Revision ID: 7d3f2a9c1b64
+Revises: 05c10f48c81e
+Create Date: 2026-10-18 10:12:41.508213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3f2a9c1b64'
+down_revision: Union[str, None] = '05c10f48c81e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table(
+        'summary_cache',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('complexity', sa.String(), nullable=False),
+        sa.Column('mode', sa.String(), nullable=False),
+        sa.Column('prompt_version', sa.String(), nullable=False),
+        sa.Column('summary', sa.Text(), nullable=False),
+        sa.Column('original_length', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('content_hash', 'complexity', 'mode', 'prompt_version')
+    )
+
+
+def downgrade():
+    op.drop_table('summary_cache')
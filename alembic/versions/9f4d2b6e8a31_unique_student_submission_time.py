@@ -0,0 +1,39 @@
+"""Make student submissions unique per session, student and submission time
+
+Revision ID: 9f4d2b6e8a31
+Revises: 3c7e91a4b2f6
+Create Date: 2026-10-18 19:48:05.207663
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9f4d2b6e8a31'
+down_revision: Union[str, None] = '3c7e91a4b2f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # Drop exact re-syncs stored before the constraint existed, keeping one copy
+    op.execute("""
+        DELETE FROM student_submissions a
+        USING student_submissions b
+        WHERE a.ctid > b.ctid
+          AND a.session_id = b.session_id
+          AND a.student_id = b.student_id
+          AND a.submitted_at = b.submitted_at
+    """)
+    op.create_unique_constraint(
+        'uq_student_submissions_session_student_time',
+        'student_submissions',
+        ['session_id', 'student_id', 'submitted_at']
+    )
+
+
+def downgrade():
+    op.drop_constraint('uq_student_submissions_session_student_time', 'student_submissions', type_='unique')
@@ -0,0 +1,33 @@
+"""Add quiz_store table
+
+Revision ID: b41e8c05d2a7
+Revises: 7d3f2a9c1b64
+Create Date: 2026-10-18 14:03:27.114902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41e8c05d2a7'
+down_revision: Union[str, None] = '7d3f2a9c1b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table(
+        'quiz_store',
+        sa.Column('namespace', sa.String(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('value', sa.JSON(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('namespace', 'key')
+    )
+
+
+def downgrade():
+    op.drop_table('quiz_store')
@@ -0,0 +1,36 @@
+"""Add chatbot_configs table
+
+Revision ID: e5a92c7f3d18
+Revises: b41e8c05d2a7
+Create Date: 2026-10-18 17:31:52.408316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a92c7f3d18'
+down_revision: Union[str, None] = 'b41e8c05d2a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table(
+        'chatbot_configs',
+        sa.Column('chapter_id', sa.String(), nullable=False),
+        sa.Column('teacher_id', sa.String(), nullable=False),
+        sa.Column('personality', sa.String(), nullable=False),
+        sa.Column('tone', sa.String(), nullable=False),
+        sa.Column('knowledge_source', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('chapter_id')
+    )
+
+
+def downgrade():
+    op.drop_table('chatbot_configs')
@@ -9,11 +9,13 @@ from datetime import datetime, timezone
 import os
 
 from app.services.auth_service import (
-    authenticate_teacher, create_access_token, get_password_hash
+    authenticate_teacher_async, create_access_token, get_password_hash, get_teacher_by_email
 )
 
 from app.db.models.assignment import Teacher
-from app.database import get_db
+from app.database import get_async_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.concurrency import run_in_threadpool
 from datetime import timedelta
 from pydantic import BaseModel, EmailStr
 import uuid
@@ -32,34 +34,34 @@ class ResetPasswordRequest(BaseModel):
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/signup")
-def signup(
+async def signup(
     name: str = Form(...),
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Normalize email
     email = email.lower()
 
     # Check if email already exists
-    if db.query(Teacher).filter(Teacher.email == email).first():
+    if await get_teacher_by_email(db, email):
         raise HTTPException(status_code=400, detail="Email is already registered.")
 
-    # Create new teacher object
+    # Create new teacher object (bcrypt runs in the threadpool, not on the event loop)
     new_teacher = Teacher(
         id=uuid.uuid4(),
         name=name,
         email=email,
-        hashed_password=get_password_hash(password),
+        hashed_password=await run_in_threadpool(get_password_hash, password),
         created_at=datetime.now(timezone.utc),
     )
 
     # Insert into database
     try:
         db.add(new_teacher)
-        db.commit()
+        await db.commit()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Email is already registered.")
 
     return {"message": "Signup successful"}
@@ -69,8 +71,8 @@ async def signup_options():
     return JSONResponse(status_code=200)
 
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_teacher(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await authenticate_teacher_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
@@ -83,12 +85,12 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
         }
 
 @router.post("/forgot-password")
-def forgot_password(
+async def forgot_password(
     request: ForgotPasswordRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(Teacher).filter(Teacher.email == request.email).first()
+    user = await get_teacher_by_email(db, request.email)
     if user:
         reset_token = create_access_token(
             data={"sub": user.email},
@@ -101,7 +103,7 @@ def forgot_password(
     return {"msg": "If this email is registered, a reset link will be sent"}
 
 @router.post("/reset-password")
-def reset_password(data: ResetPasswordRequest, db: Session = Depends(get_db)):
+async def reset_password(data: ResetPasswordRequest, db: AsyncSession = Depends(get_async_db)):
     from app.services.auth_service import verify_token
 
     try:
@@ -116,13 +118,13 @@ def reset_password(data: ResetPasswordRequest, db: Session = Depends(get_db)):
             print("[DEBUG] No email in token")
             raise HTTPException(status_code=400, detail="Invalid token")
 
-        user = db.query(Teacher).filter(Teacher.email == email).first()
+        user = await get_teacher_by_email(db, email)
         if not user:
             print("[DEBUG] No user found for email:", email)
             raise HTTPException(status_code=404, detail="User not found")
 
-        user.hashed_password = get_password_hash(data.new_password)
-        db.commit()
+        user.hashed_password = await run_in_threadpool(get_password_hash, data.new_password)
+        await db.commit()
         print("[DEBUG] Password reset successful")
         return {"msg": "Password has been reset successfully"}
     
@@ -1,18 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, Response
 import re  # for regular expressions
 from sqlalchemy.orm import make_transient
 from sqlalchemy.orm import Session
 from datetime import datetime
 from typing import Optional, List, Dict
 import uuid
-import io
-import docx
-import PyPDF2
 from uuid import UUID
 
+import logging
 import traceback
 import json
 from app.services.llm_service_assignments import LLMAssignmentService
+from app.services import document_ingestion
+from app.services.extraction_engine import ExtractionBusyError
+from app.services.session_payload_cache import build_session_payload, session_payload_cache
+from app.services.grading import CompiledAnswerKey, answer_key_cache
+from app.services.submission_writer import submission_writer
+from app.core.config import settings
 from pydantic import ValidationError
 from sqlalchemy.exc import SQLAlchemyError, InvalidRequestError  # Add this import at the top
 
@@ -31,18 +35,25 @@ from app.services.auth_service import (
 )
 
 from app.crud.assignment import (  # Your existing CRUD operations
+    get_submission_with_assignment
+)
+from app.crud.async_assignment import (  # AsyncSession CRUD for the async routes
     create_assignment,
-    get_assignment,
+    get_assignment as get_assignment_async,
     add_questions,
     create_active_assignment,
-    get_active_assignment,
-    save_student_submission,
-    save_probing_questions,
-    get_probing_questions_by_question_id
+    get_active_assignment_with_content,
+    get_assignment_with_teacher,
+    get_submissions_by_assignment_id,
+    build_submission_row,
+    save_student_submissions_bulk,
+    save_probing_questions_bulk
 )
 from app.models.assignmentmodels import (  # Your Pydantic schemas (keep these as-is)
     AssignmentResponse,
     GradedAssignmentResponse,
+    BulkGradedAssignmentResponse,
+    StudentGradeResult,
     ProbingQuestion as ProbingQuestionSchema,
     AssignmentMeta,
     StudentInteraction,
@@ -53,7 +64,10 @@ from app.models.assignmentmodels import (  # Your Pydantic schemas (keep these a
     InteractionAnalysis,
     StudentSubmissionOut
 )
-from app.database import get_db  # Your database session dependency
+from app.database import get_db, get_async_db  # Your database session dependencies
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/assignments",
@@ -62,27 +76,14 @@ router = APIRouter(
 
 llm_service = LLMAssignmentService() 
 
+MAX_CONTEXT_TOKENS = 8000  # Upper bound on uploaded material sent to the LLM
+MAX_BULK_SUBMISSIONS = 500  # Per offline sync request
+
 async def extract_uploaded_content(file: UploadFile) -> str:
     try:
-        content = await file.read()
-        
-        if file.filename.endswith('.pdf'):
-            try:
-                with io.BytesIO(content) as pdf_file:
-                    reader = PyPDF2.PdfReader(pdf_file)
-                    return "\n".join(page.extract_text() for page in reader.pages if page.extract_text())
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"PDF processing failed: {str(e)}")
-        
-        elif file.filename.endswith('.docx'):
-            try:
-                with io.BytesIO(content) as doc_file:
-                    doc = docx.Document(doc_file)
-                    return "\n".join(para.text for para in doc.paragraphs)
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"DOCX processing failed: {str(e)}")
-        
-        return content.decode("utf-8")
+        return await document_ingestion.ingest_upload(file, max_tokens=MAX_CONTEXT_TOKENS)
+    except ExtractionBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"File processing failed: {str(e)}")
 
@@ -94,7 +95,7 @@ async def generate_assignment(
     difficulty: str = Form("intermediate"),
     question_count: int = Form(1),
     materials: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_teacher: Teacher = Depends(get_current_teacher)
 ):
     # Validate inputs
@@ -108,7 +109,7 @@ async def generate_assignment(
         title = f"Assignment on {topic}"
         resolved_subject = subject or "general"
         
-        db_assignment = create_assignment(
+        db_assignment = await create_assignment(
             db,
             title=title,
             subject=resolved_subject,
@@ -126,7 +127,8 @@ async def generate_assignment(
             subject=resolved_subject,
             difficulty=difficulty,
             question_count=question_count,
-            context=context
+            context=context,
+            teacher_id=str(current_teacher.id)
         )
         
         if not assignment_content or "questions" not in assignment_content:
@@ -136,67 +138,54 @@ async def generate_assignment(
         
         
         try:
-            # Begin transaction only if not already in one
-            if not db.in_transaction():
-                db.begin()
-
-            saved_questions = add_questions(db, assignment_id=db_assignment.id, questions=assignment_content["questions"])
+            saved_questions = await add_questions(db, assignment_id=db_assignment.id, questions=assignment_content["questions"])
             
             if saved_questions is None:
-                db.rollback()
+                await db.rollback()
                 raise HTTPException(status_code=500, detail="Failed to save questions to database")
             
             print(f"DEBUG: Saved questions: {saved_questions} (type: {type(saved_questions)})")
             print(f"First saved question attributes: {dir(saved_questions[0]) if saved_questions else 'None'}")
             
-            probing_questions = {}
+            question_data_list = []
             for question in saved_questions:
-                try:
-                    # Properly extract data from SQLAlchemy object
-                    if hasattr(question, '__table__'):  # SQLAlchemy model check
-                        question_data = {
-                            'id': str(question.id),
-                            'text': question.text,
-                            'answer': question.answer,
-                            'type': getattr(question, 'type', 'procedural')
-                        }
-                    else:
-                        question_data = question  # Already a dict
-                        
-                    print(f"DEBUG: Processing question {question_data['id']}")
-                    
-                    # Generate probing questions
-                    probing_results = await llm_service.generate_probing_questions(
-                        question_data['text'],
-                        question_data['answer'],
-                        resolved_subject
-                    )
-                    
-                    if not probing_results:
-                        print("WARNING: No probing questions generated")
-                        continue
-                        
-                    # Convert ProbingQuestion objects to dicts
-                    probing_questions[question_data['id']] = [{
-                        'id': pq.id,
-                        'text': pq.text,
-                        'hint': pq.hint
-                    } for pq in probing_results]
-                    
-                    # Save to database
-                    save_probing_questions(db, question_id=question_data['id'], probing_questions=probing_results)
-                    
-                except Exception as e:
-                    print(f"ERROR processing question: {str(e)}")
+                # Properly extract data from SQLAlchemy object
+                if hasattr(question, '__table__'):  # SQLAlchemy model check
+                    question_data_list.append({
+                        'id': str(question.id),
+                        'text': question.text,
+                        'answer': question.answer,
+                        'type': getattr(question, 'type', 'procedural')
+                    })
+                else:
+                    question_data_list.append(question)  # Already a dict
+
+            # One batched LLM call for all questions; malformed entries fall back per question
+            probing_to_save = await llm_service.generate_probing_questions_batch(
+                question_data_list,
+                resolved_subject,
+                teacher_id=str(current_teacher.id)
+            )
+
+            probing_questions = {}
+            for question_data in question_data_list:
+                probing_results = probing_to_save.get(str(question_data['id']))
+                if not probing_results:
+                    logger.warning(f"No probing questions generated for question {question_data['id']}")
                     continue
-            
-            # Commit only if we started the transaction
-            if db.in_transaction():
-                db.commit()
+
+                # Convert ProbingQuestion objects to dicts
+                probing_questions[str(question_data['id'])] = [{
+                    'id': pq.id,
+                    'text': pq.text,
+                    'hint': pq.hint
+                } for pq in probing_results]
+
+            # Save all probing questions in one write
+            await save_probing_questions_bulk(db, probing_to_save)
             
         except (SQLAlchemyError, InvalidRequestError) as e:
-            if db.in_transaction():
-                db.rollback()
+            await db.rollback()
             print(f"Database error:\n{traceback.format_exc()}")
             raise HTTPException(status_code=500, detail="Database operation failed")
         
@@ -235,19 +224,24 @@ async def generate_assignment(
 @router.post("/publish/{assignment_id}")
 async def publish_assignment(
     assignment_id: UUID,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
 
-    assignment = get_assignment(db, assignment_id)
+    assignment = await get_assignment_async(db, assignment_id)
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
 
-    active_assignment = create_active_assignment(
+    active_assignment = await create_active_assignment(
         db,
         assignment_id=assignment_id,
         teacher_id="current_user_id"
     )
 
+    # Precompile the student payload so the first students to open the link hit the cache
+    published = await get_active_assignment_with_content(db, str(active_assignment.session_id))
+    if published:
+        session_payload_cache.set(published, build_session_payload(published))
+
     return {
         "shareable_link": f"/student/assignment/{active_assignment.session_id}",
         "session_id": active_assignment.session_id
@@ -256,99 +250,52 @@ async def publish_assignment(
 @router.get("/session/{session_id}", response_model=GeneratedAssignment)
 async def get_assignment_session(
     session_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    active_assignment = get_active_assignment(db, session_id)
-    if not active_assignment:
-        raise HTTPException(status_code=404, detail="Assignment session not found")
+    # Published content is immutable: serve the precompiled payload when we have it
+    payload = session_payload_cache.get(session_id)
+    if payload is None:
+        # Session, assignment, questions and probing questions in a fixed 4 queries
+        active_assignment = await get_active_assignment_with_content(db, session_id)
+        if not active_assignment:
+            raise HTTPException(status_code=404, detail="Assignment session not found")
 
-    assignment = get_assignment(db, active_assignment.assignment_id)
-    if not assignment:
-        raise HTTPException(status_code=404, detail="Assignment content not found")
+        if not active_assignment.assignment:
+            raise HTTPException(status_code=404, detail="Assignment content not found")
 
-    # Get questions and probing questions
-    questions = db.query(AssignmentQuestion).filter(
-        AssignmentQuestion.assignment_id == assignment.id
-    ).all()
+        payload = build_session_payload(active_assignment)
+        session_payload_cache.set(active_assignment, payload)
 
-    probing_questions = {}
-    for question in questions:
-        probing = get_probing_questions_by_question_id(db, question.id)
-        probing_questions[str(question.id)] = [
-            ProbingQuestionSchema.from_orm(pq) for pq in probing
-        ]
+    return Response(content=payload, media_type="application/json")
 
-    return {
-        "assignment_id": str(assignment.id),
-        "session_id": str(session_id),
-        "title": assignment.title,
-        "subject": assignment.subject,
-        "questions": [
-            {
-                "id": str(q.id),
-                "text": q.text,
-                "answer": q.answer,
-                "explanation": q.explanation,
-                "type": q.type
-            } for q in questions
-        ],
-        "probing_questions": probing_questions,
-        "status": "active",
-        "question_count": len(questions) 
-    }
+async def load_answer_key(db: AsyncSession, session_id: str) -> CompiledAnswerKey:
+    """Compiled answer key for a session; the DB is only read on a cache miss"""
+    answer_key = answer_key_cache.get_for_session(session_id)
+    if answer_key is None:
+        active_assignment = await get_active_assignment_with_content(db, session_id, with_probing=False)
+        if not active_assignment:
+            raise HTTPException(status_code=404, detail="Assignment session not found")
+
+        if not active_assignment.assignment:
+            raise HTTPException(status_code=404, detail="Assignment content not found")
+
+        answer_key = answer_key_cache.compile(active_assignment)
+    return answer_key
 
 @router.post("/submit/{session_id}", response_model=GradedAssignmentResponse)
 async def submit_assignment(
     session_id: str,
     response: AssignmentResponse,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    active_assignment = get_active_assignment(db, session_id)
-    if not active_assignment:
-        raise HTTPException(status_code=404, detail="Assignment session not found")
-
-    assignment = get_assignment(db, active_assignment.assignment_id)
-    if not assignment:
-        raise HTTPException(status_code=404, detail="Assignment content not found")
+    answer_key = await load_answer_key(db, session_id)
 
     # Grade the submission
-    score = 0
-    feedback = {}
-    interaction_analysis = {}
-
-    questions = db.query(AssignmentQuestion).filter(
-        AssignmentQuestion.assignment_id == assignment.id
-    ).all()
-
-    for question in questions:
-        q_id = str(question.id)
-        student_answer = response.answers.get(q_id)
-        
-        is_correct = (str(student_answer).lower() == str(question.answer).lower())
-        if is_correct:
-            score += 1
-
-        interactions_list = response.interactions.get(q_id, [])
-        hint_usage = sum(1 for i in interactions_list if i.type == "hint_used")
-        
-        interaction_analysis[q_id] = {
-            "hints_used": hint_usage,
-            "probing_engaged": len(interactions_list),
-            "time_spent": response.time_spent.get(q_id, 0)
-        }
-        question_text_lookup = {str(q.id): q.text for q in questions}
-
-        feedback[q_id] = {
-            "correct": is_correct,
-            "student_answer": student_answer,
-            "question_text": question_text_lookup[q_id],
-            "interaction_analysis": interaction_analysis[q_id]
-        }
+    score, feedback, interaction_analysis = answer_key.grade(response)
 
-    # Save submission
-    save_student_submission(
-        db,
-        assignment_id=active_assignment.assignment_id,
+    # Save submission: queued for a batched insert in write-behind mode, otherwise written now
+    submission_row = build_submission_row(
+        assignment_id=answer_key.assignment_id,
         session_id=session_id,
         student_id=response.student_id,
         score=score,
@@ -356,14 +303,80 @@ async def submit_assignment(
         interactions=response.interactions,
         time_spent=response.time_spent
     )
+    if not (settings.SUBMISSION_WRITE_BEHIND and submission_writer.enqueue(submission_row)):
+        await save_student_submissions_bulk(db, [submission_row])
 
     return GradedAssignmentResponse(
         score=score,
-        total_questions=len(questions),
+        total_questions=len(answer_key.questions),
         feedback=feedback,
         interaction_analysis=interaction_analysis
     )
 
+@router.post("/submit/{session_id}/bulk", response_model=BulkGradedAssignmentResponse)
+async def submit_assignments_bulk(
+    session_id: str,
+    responses: List[AssignmentResponse],
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Offline classroom sync: grade many students' responses for one session
+    against a single loaded answer key and store them with one bulk insert.
+
+    Each response keeps the ``timestamp`` recorded on the device, and a
+    response already stored for the same student and timestamp is skipped,
+    so a sync can safely be retried after a partial failure.
+    """
+    if not responses:
+        raise HTTPException(status_code=400, detail="No submissions provided")
+    if len(responses) > MAX_BULK_SUBMISSIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_BULK_SUBMISSIONS} submissions can be synced per request"
+        )
+
+    answer_key = await load_answer_key(db, session_id)
+
+    results = []
+    rows = []
+    for response in responses:
+        score, feedback, interaction_analysis = answer_key.grade(response)
+        results.append(StudentGradeResult(
+            student_id=response.student_id,
+            score=score,
+            total_questions=len(answer_key.questions),
+            feedback=feedback
+        ))
+        rows.append(build_submission_row(
+            assignment_id=answer_key.assignment_id,
+            session_id=session_id,
+            student_id=response.student_id,
+            score=score,
+            answers=response.answers,
+            interactions=response.interactions,
+            time_spent=response.time_spent,
+            submitted_at=response.timestamp
+        ))
+
+    try:
+        inserted = await save_student_submissions_bulk(db, rows)
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception(f"Failed to save {len(rows)} bulk submissions for session {session_id}")
+        raise HTTPException(status_code=500, detail="Failed to save submissions")
+
+    return BulkGradedAssignmentResponse(
+        session_id=session_id,
+        submitted=inserted,
+        duplicates=len(rows) - inserted,
+        results=results
+    )
+
+@router.get("/metrics/submission-queue")
+async def get_submission_queue_metrics():
+    """Queue depth and flush counters of the write-behind submission writer"""
+    return submission_writer.stats()
+
 @router.post("/notify-teacher/{session_id}")
 async def notify_teacher(session_id: str, payload: dict):
     print(f"[DEBUG] Notify teacher for session {session_id}")
@@ -373,12 +386,13 @@ async def notify_teacher(session_id: str, payload: dict):
 
 @router.get("/teacher/submission-detail/{submission_id}")
 def get_teacher_submission_detail(submission_id: str, db: Session = Depends(get_db)):
-    sub = db.query(StudentSubmission).filter_by(id=submission_id).first()
+    # Submission, assignment and questions in 2 queries
+    sub = get_submission_with_assignment(db, submission_id)
     if not sub:
         raise HTTPException(status_code=404, detail="Submission not found")
 
-    assignment = get_assignment(db, sub.assignment_id)
-    questions = db.query(AssignmentQuestion).filter_by(assignment_id=assignment.id).all()
+    assignment = sub.assignment
+    questions = assignment.questions
 
     return {
         "submission_id": sub.id,
@@ -412,12 +426,13 @@ def summarize_interactions(interactions_dict: dict, time_spent_dict: dict) -> di
     return summary
 
 @router.get("/assignments/{assignment_id}/submissions")
-async def get_submissions(assignment_id: UUID, db: Session = Depends(get_db)):
-    assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
+async def get_submissions(assignment_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    # Assignment with teacher joined in, then submissions: 2 queries
+    assignment = await get_assignment_with_teacher(db, assignment_id)
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
 
-    submissions = db.query(StudentSubmission).filter_by(assignment_id=assignment_id).all()
+    submissions = await get_submissions_by_assignment_id(db, assignment_id)
 
     return {
         "teacher_name": assignment.teacher.name if assignment.teacher else None,
@@ -1,44 +1,52 @@
 # chatbot.py
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from pydantic import BaseModel
-from typing import Optional, List
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Dict, Optional, List, Tuple
+import asyncio
+import glob
+import json
+import logging
 import os
+from pathlib import Path
+from contextlib import nullcontext
 import openai
 from datetime import datetime
-from openai import AsyncOpenAI 
 from app.core.config import settings
+from app.crud.chatbot import upsert_chatbot_config
+from app.database import AsyncSessionLocal, get_async_db
+from app.models.chatbotmodels import ChatbotConfig, ChatbotResponse
+from app.services.chatbot_configs import (
+    PERSONALITY_PROMPTS,
+    TONE_MODIFIERS,
+    ResolvedChatbot,
+    chatbot_config_cache,
+    default_chatbot
+)
+from app.services.answer_cache import CachedAnswer, answer_cache
+from app.services.chat_sessions import ChatSession, chat_sessions
+from app.services.llm_gateway import llm_gateway
+from app.services.llm_scheduler import Priority
+from app.services.document_ingestion import ALLOWED_FILE_TYPES, ingest_contents, ingest_file, read_upload, sanitize_text
+from app.services.extraction_engine import ExtractionBusyError
+from app.services.retrieval_index import retrieval_indexes
+from app.utils.cache import LRUCache
+from app.utils.sse import SSE_HEADERS, format_sse
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize client using your config
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)  # Using async client
-
-# Database models (example - integrate with your actual DB)
-class ChatbotConfig(BaseModel):
-    chapter_id: str
-    teacher_id: str
-    personality: str  # "formal", "friendly", "humorous", etc.
-    tone: str  # "encouraging", "strict", "casual"
-    knowledge_source: Optional[str] = None  # File path or text
-    created_at: datetime = datetime.now()
-
-class ChatbotResponse(BaseModel):
-    response: str
-    sources: List[str] = []
-
-# Personality templates
-PERSONALITY_PROMPTS = {
-    "formal": "You are a formal teaching assistant. Use professional language and maintain academic tone.",
-    "friendly": "You are a friendly teaching assistant. Be warm and approachable in your responses.",
-    "humorous": "You are a humorous teaching assistant. Use appropriate jokes and keep explanations light.",
-    "socratic": "You are a Socratic teaching assistant. Answer questions with guiding questions.",
-}
-
-TONE_MODIFIERS = {
-    "encouraging": "Always provide positive reinforcement and encouragement.",
-    "strict": "Be concise and direct. Focus on accuracy.",
-    "casual": "Use informal language as if talking to a peer.",
-}
+CHATBOT_MODEL = "gpt-4.1-nano"
+
+# Original uploads are kept here as {chapter_id}_{filename} so a lost index can be
+# rebuilt; chapters set up before indexing read them on every question
+SOURCE_DIR = "chatbot_sources"
+
+# Index builds in progress, and chapters recently found to have nothing to index
+_index_builds: Dict[str, asyncio.Task] = {}
+_unindexed = LRUCache(maxsize=1024, ttl=300)
 
 @router.post("/create")
 async def create_chatbot(
@@ -47,7 +55,8 @@ async def create_chatbot(
     personality: str = "friendly",
     tone: str = "encouraging",
     file: Optional[UploadFile] = File(None),
-    text: Optional[str] = None
+    text: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         # Validate personality/tone
@@ -56,87 +65,355 @@ async def create_chatbot(
         if tone not in TONE_MODIFIERS:
             raise HTTPException(status_code=400, detail="Invalid tone selected")
 
-        # Store knowledge source
+        # Extract the knowledge source once and store it as an indexed chunk file,
+        # so questions never re-read or re-parse the original upload. The original
+        # is kept as the config's knowledge source to rebuild the index from.
         knowledge_source = None
+        source_text = None
         if file:
-            os.makedirs("chatbot_sources", exist_ok=True)
-            file_path = f"chatbot_sources/{chapter_id}_{file.filename}"
-            with open(file_path, "wb+") as f:
-                f.write(file.file.read())
-            knowledge_source = file_path
+            try:
+                contents, file_ext = await read_upload(file)
+                source_text = await ingest_contents(contents, file_ext, file.filename)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            source_name = os.path.basename(file.filename)
         elif text:
-            knowledge_source = f"chatbot_sources/{chapter_id}_text.txt"
-            with open(knowledge_source, "w") as f:
-                f.write(text)
+            contents = text.encode("utf-8")
+            source_text = sanitize_text(text)
+            source_name = "text.txt"
+
+        if source_text:
+            knowledge_source = await run_in_threadpool(save_knowledge_source, chapter_id, source_name, contents)
+            await run_in_threadpool(retrieval_indexes.build, chapter_id, source_text, source_name)
+        else:
+            # No source any more: don't keep answering from the previous one
+            await run_in_threadpool(retrieval_indexes.delete, chapter_id)
 
-        # Create and store config (in a real app, save to database)
-        config = ChatbotConfig(
+        # Create and store config
+        record = await upsert_chatbot_config(
+            db,
             chapter_id=chapter_id,
             teacher_id=teacher_id,
             personality=personality,
             tone=tone,
             knowledge_source=knowledge_source
         )
-        
-        # TODO: Store config in database
+        config = ChatbotConfig.model_validate(record)
+        chatbot_config_cache.set(config)
+        answer_cache.invalidate_chapter(chapter_id)
+        _unindexed.pop(chapter_id)
         
         return {"message": "Chatbot created successfully", "config": config}
     
+    except HTTPException:
+        raise
+    except ExtractionBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def save_knowledge_source(chapter_id: str, name: str, contents: bytes) -> str:
+    """Keep the original upload next to the index and return its path"""
+    os.makedirs(SOURCE_DIR, exist_ok=True)
+    path = os.path.join(SOURCE_DIR, f"{chapter_id}_{name}")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(contents)
+    os.replace(tmp_path, path)
+    return path
+
+async def get_chatbot(db: AsyncSession, chapter_id: str) -> ResolvedChatbot:
+    # Config and system prompt come from the cache; the DB is only hit on a miss
+    chatbot = await chatbot_config_cache.get(db, chapter_id)
+    if chatbot is None:
+        # Chapters set up before configs were stored may still have an upload on disk
+        chatbot = default_chatbot(chapter_id)
+        await ensure_retrieval_index(chatbot, chapter_id, legacy=True)
+    else:
+        await ensure_retrieval_index(chatbot, chapter_id)
+    return chatbot
+
+def find_knowledge_source(chatbot: ResolvedChatbot, chapter_id: str, legacy: bool = False) -> Optional[str]:
+    """Original upload to build a missing index from: the configured one, or a legacy upload.
+
+    Derived files such as an index's chunk file are never used, since they
+    cannot be re-chunked faithfully.
+    """
+    source = chatbot.config.knowledge_source
+    if source and Path(source).suffix.lower() in ALLOWED_FILE_TYPES and os.path.isfile(source):
+        return source
+    if not legacy:
+        return None
+    pattern = os.path.join(glob.escape(SOURCE_DIR), f"{glob.escape(chapter_id)}_*")
+    uploads = sorted(
+        (path for path in glob.glob(pattern) if Path(path).suffix.lower() in ALLOWED_FILE_TYPES),
+        key=os.path.getmtime
+    )
+    return uploads[-1] if uploads else None
+
+async def build_index_from_source(chatbot: ResolvedChatbot, chapter_id: str, legacy: bool) -> None:
+    source = await run_in_threadpool(find_knowledge_source, chatbot, chapter_id, legacy)
+    if source is None:
+        if chatbot.config.knowledge_source:
+            logger.warning(
+                f"Chatbot for chapter {chapter_id} has no retrieval index and its original source "
+                f"{chatbot.config.knowledge_source} is gone; answers will not be grounded"
+            )
+        _unindexed.set(chapter_id, True)
+        return
+
+    logger.info(f"Building missing retrieval index for chapter {chapter_id} from {source}")
+    try:
+        text = await ingest_file(source)
+        if not text:
+            raise ValueError("no text could be extracted")
+        await run_in_threadpool(retrieval_indexes.build, chapter_id, text, os.path.basename(source))
+    except Exception as e:
+        logger.warning(f"Could not build retrieval index for chapter {chapter_id} from {source}: {str(e)}")
+        _unindexed.set(chapter_id, True)
+
+async def ensure_retrieval_index(chatbot: ResolvedChatbot, chapter_id: str, legacy: bool = False) -> None:
+    """Build the chapter's index on first use if it predates indexing or was lost.
+
+    ``legacy`` also looks for an upload saved by the old create endpoint, for
+    chapters without a stored config. Concurrent questions share one build;
+    chapters with nothing to index are not re-checked for a few minutes.
+    """
+    if chapter_id in _unindexed:
+        return
+    # Loading stats the index file and parses it on a miss, so keep it off the event loop
+    if await run_in_threadpool(retrieval_indexes.load, chapter_id) is not None:
+        return
+    task = _index_builds.get(chapter_id)
+    if task is None:
+        task = asyncio.ensure_future(build_index_from_source(chatbot, chapter_id, legacy))
+        _index_builds[chapter_id] = task
+        task.add_done_callback(lambda _: _index_builds.pop(chapter_id, None))
+    await asyncio.shield(task)
+
+async def prepare_answer(
+    chatbot: ResolvedChatbot,
+    chapter_id: str,
+    question: str,
+    history: Optional[List[Dict[str, str]]] = None
+) -> Tuple[List[Dict[str, str]], List[str]]:
+    """Build the chat messages for a question and the chunk ids they draw on"""
+    # Get the chunks of the knowledge source most relevant to the question;
+    # BM25 scoring is CPU-bound, so it runs in the threadpool
+    hits = await run_in_threadpool(retrieval_indexes.search, chapter_id, question)
+    context = "\n\n---\n\n".join(chunk for _, chunk in hits)
+    sources = [f"{chapter_id}#chunk-{chunk_id}" for chunk_id, _ in hits]
+
+    messages = [
+        {"role": "system", "content": chatbot.system_prompt},
+        *(history or []),
+        {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"}
+    ]
+    return messages, sources
+
+async def stream_answer(messages: List[Dict[str, str]], teacher_id: Optional[str] = None) -> AsyncIterator[str]:
+    """Run the chatbot completion, yielding content deltas as they arrive"""
+    async for token in llm_gateway.stream_chat(
+        priority=Priority.INTERACTIVE_STUDENT,
+        tenant=teacher_id,
+        model=CHATBOT_MODEL,
+        messages=messages,
+        temperature=0.7
+    ):
+        yield token
+
+class ChatTurn:
+    """One question to a chapter's chatbot, optionally within a conversation session.
+
+    Opening questions are served from the answer cache when possible;
+    follow-ups depend on the conversation and always go to the model; their
+    context is retrieved when the turn runs. The caller holds ``session.lock``
+    for the duration of the turn.
+    """
+
+    def __init__(
+        self,
+        chatbot: ResolvedChatbot,
+        chapter_id: str,
+        question: str,
+        session: Optional[ChatSession] = None
+    ):
+        self.chatbot = chatbot
+        self.chapter_id = chapter_id
+        self.question = question
+        self.session = session
+        self.answer: Optional[str] = None
+        self.cacheable = not (session and session.has_history)
+        self.cached = answer_cache.get(chapter_id, chatbot.version, question) if self.cacheable else None
+        self.messages: Optional[List[Dict[str, str]]] = None
+        self.sources: List[str] = self.cached.sources if self.cached is not None else []
+
+    async def prepare(self) -> None:
+        history = self.session.history() if self.session else None
+        self.messages, self.sources = await prepare_answer(self.chatbot, self.chapter_id, self.question, history)
+
+    def finish(self, answer: str) -> None:
+        self.answer = answer
+        if self.cacheable and self.cached is None:
+            answer_cache.set(self.chapter_id, self.chatbot.version, self.question, CachedAnswer(answer, self.sources))
+        if self.session is not None:
+            self.session.record(self.question, answer)
+            chat_sessions.after_turn(self.session)
+
+    async def complete(self) -> str:
+        if self.cached is not None:
+            answer = self.cached.response
+        else:
+            await self.prepare()
+            response = await llm_gateway.chat(
+                priority=Priority.INTERACTIVE_STUDENT,
+                tenant=self.chatbot.config.teacher_id,
+                model=CHATBOT_MODEL,
+                messages=self.messages,
+                temperature=0.7
+            )
+            answer = response.choices[0].message.content
+        self.finish(answer)
+        return answer
+
+    async def stream(self) -> AsyncIterator[str]:
+        parts = []
+        if self.cached is not None:
+            parts.append(self.cached.response)
+            yield self.cached.response
+        else:
+            await self.prepare()
+            async for token in stream_answer(self.messages, self.chatbot.config.teacher_id):
+                parts.append(token)
+                yield token
+        self.finish("".join(parts))
+
+def session_lock(session: Optional[ChatSession]):
+    return session.lock if session is not None else nullcontext()
+
 @router.post("/ask/{chapter_id}")
-async def ask_chatbot(chapter_id: str, question: str):
+async def ask_chatbot(
+    chapter_id: str,
+    question: str,
+    student_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Answer a question; passing student_id continues that student's conversation"""
     try:
-        # TODO: Retrieve config from database
-        # For now using dummy config
-        config = ChatbotConfig(
-            chapter_id=chapter_id,
-            teacher_id="dummy",
-            personality="friendly",
-            tone="encouraging"
-        )
-        
-        # Build system prompt
-        system_prompt = (
-            f"{PERSONALITY_PROMPTS[config.personality]} "
-            f"{TONE_MODIFIERS[config.tone]} "
-            "You are assisting students with questions about their course material. "
-            "Base your answers strictly on the provided course content."
-        )
-        
-        # Get relevant context from knowledge source
-        context = ""
-        if config.knowledge_source and os.path.exists(config.knowledge_source):
-            with open(config.knowledge_source, "r") as f:
-                context = f.read(4000)  # Limit context size
-        
-        # Generate response
-        response = await client.chat.completions.create(  # Using the initialized client
-        model="gpt-4.1-nano",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"}
-            ],
-            temperature=0.7
-        )
+        chatbot = await get_chatbot(db, chapter_id)
+        session = chat_sessions.get(chapter_id, student_id) if student_id else None
+        async with session_lock(session):
+            turn = ChatTurn(chatbot, chapter_id, question, session)
+            answer = await turn.complete()
         
         return ChatbotResponse(
-            response=response.choices[0].message.content,
-            sources=[config.knowledge_source] if config.knowledge_source else []
+            response=answer,
+            sources=turn.sources
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/ask/{chapter_id}/stream")
+async def ask_chatbot_stream(
+    chapter_id: str,
+    question: str,
+    student_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Streaming variant of ask_chatbot over Server-Sent Events.
+
+    Emits "token" events as the answer is generated and closes with a "done"
+    event carrying the full response and its sources. Failures after the
+    stream has started are reported as an "error" event.
+    """
+    try:
+        chatbot = await get_chatbot(db, chapter_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    session = chat_sessions.get(chapter_id, student_id) if student_id else None
+
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            async with session_lock(session):
+                turn = ChatTurn(chatbot, chapter_id, question, session)
+                async for token in turn.stream():
+                    yield format_sse({"content": token}, event="token")
+            yield format_sse({
+                "response": turn.answer,
+                "sources": turn.sources,
+                "cached": turn.cached is not None
+            }, event="done")
+        except Exception as e:
+            logger.error(f"Chatbot streaming failed for chapter {chapter_id}: {str(e)}")
+            yield format_sse({"detail": "Failed to generate a response"}, event="error")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.websocket("/ws/{chapter_id}")
+async def chatbot_websocket(websocket: WebSocket, chapter_id: str, student_id: Optional[str] = None):
+    """
+    Multi-turn chatbot over a WebSocket.
+
+    The client sends {"question": "..."} (or the bare question text) per turn. Each answer is streamed as
+    {"type": "token", "content": ...} messages followed by
+    {"type": "done", "response": ..., "sources": [...]}; a failed turn sends
+    {"type": "error", "detail": ...} and the connection stays open. With a
+    student_id the conversation is the same server-side session used by the
+    HTTP routes and survives reconnects; without one it lasts for the connection.
+    """
+    await websocket.accept()
+    local_session = ChatSession(chapter_id)
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                payload = json.loads(message)
+            except ValueError:
+                payload = {"question": message}  # Plain text frames are taken as the question
+            question = str(payload.get("question", "")).strip() if isinstance(payload, dict) else ""
+            if not question:
+                await websocket.send_json({"type": "error", "detail": "question is required"})
+                continue
+
+            try:
+                # Short-lived DB session per turn so an idle socket does not hold a connection
+                async with AsyncSessionLocal() as db:
+                    chatbot = await get_chatbot(db, chapter_id)
+                session = chat_sessions.get(chapter_id, student_id) if student_id else local_session
+                async with session.lock:
+                    turn = ChatTurn(chatbot, chapter_id, question, session)
+                    async for token in turn.stream():
+                        await websocket.send_json({"type": "token", "content": token})
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.error(f"Chatbot WebSocket turn failed for chapter {chapter_id}: {str(e)}")
+                await websocket.send_json({"type": "error", "detail": "Failed to generate a response"})
+                continue
+
+            await websocket.send_json({"type": "done", "response": turn.answer, "sources": turn.sources})
+    except WebSocketDisconnect:
+        logger.info(f"Chatbot WebSocket closed for chapter {chapter_id}")
+
+@router.delete("/session/{chapter_id}")
+async def reset_chatbot_session(chapter_id: str, student_id: str):
+    """Forget a student's conversation with a chapter's chatbot"""
+    chat_sessions.reset(chapter_id, student_id)
+    return {"message": "Session cleared"}
+
 @router.get("/public/{chapter_id}")
-async def get_public_chatbot_config(chapter_id: str):
-    # In real DB, retrieve config
-    config = ChatbotConfig(
-        chapter_id=chapter_id,
-        teacher_id="dummy",
-        personality="friendly",
-        tone="encouraging",
-        knowledge_source=f"chatbot_sources/{chapter_id}_text.txt"
-    )
-    return config
\ No newline at end of file
+async def get_public_chatbot_config(chapter_id: str, db: AsyncSession = Depends(get_async_db)):
+    chatbot = await chatbot_config_cache.get(db, chapter_id) or default_chatbot(chapter_id)
+    return chatbot.config
+
+@router.get("/answer-cache/stats")
+async def get_answer_cache_stats():
+    """Hit/miss counters for the per-chapter answer cache"""
+    return answer_cache.stats()
+
+@router.get("/sessions/stats")
+async def get_chat_session_stats():
+    """Number of live chatbot conversations"""
+    return chat_sessions.stats()
@@ -1,25 +1,26 @@
 # app/api/quizgenerator.py
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from typing import Dict, Optional
 import os
-from openai import AsyncOpenAI 
-import PyPDF2
-import docx
-import io
 import json
 import uuid
 from datetime import datetime
 from app.core.config import settings
 from app.core.database import get_quizzes_db, get_active_quizzes_db
+from app.core.quiz_store import QuizStore
 from app.models.quizmodels import Quiz, Question  # Import shared models
+from app.services import document_ingestion
+from app.services.extraction_engine import ExtractionBusyError
+from app.services.llm_gateway import llm_gateway
+from app.services.llm_scheduler import Priority
 
 router = APIRouter(
     prefix="/quiz",
     tags=["Quiz Generation"]
 )
 
-# Initialize client using your config
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+MAX_NOTES_TOKENS = 8000  # Upper bound on uploaded notes sent to the LLM
 
 @router.post("/generate")
 async def generate_quiz(
@@ -29,19 +30,12 @@ async def generate_quiz(
     quiz_type: str = Form("mcq"),
     question_count: int = Form(5),
     notes: UploadFile = File(None),
-    quizzes_db: Dict = Depends(get_quizzes_db),
-    active_quizzes_db: Dict = Depends(get_active_quizzes_db)
+    quizzes_db: QuizStore = Depends(get_quizzes_db),
+    active_quizzes_db: QuizStore = Depends(get_active_quizzes_db)
 ):
     """Generate a new quiz and create an active session for it"""
     try:
-        notes_text = ""
-        if notes:
-            if notes.filename.endswith('.pdf'):
-                notes_text = extract_text_from_pdf(notes.file)
-            elif notes.filename.endswith('.docx'):
-                notes_text = extract_text_from_docx(notes.file)
-            else:
-                notes_text = (await notes.read()).decode("utf-8")
+        notes_text = await document_ingestion.ingest_upload(notes, max_tokens=MAX_NOTES_TOKENS) if notes else ""
 
         quiz_data = await generate_quiz_with_ai(
             class_level=class_level,
@@ -66,16 +60,17 @@ async def generate_quiz(
             "time_limit": 1800  # Default 30 minutes
         }
 
-        # Store the quiz
-        quizzes_db[quiz_id] = full_quiz
+        # Store the quiz (stores may be SQL-backed, so keep the writes off the event loop)
+        await run_in_threadpool(quizzes_db.__setitem__, quiz_id, full_quiz)
 
         # Create active session
-        active_quizzes_db[session_id] = {
+        await run_in_threadpool(active_quizzes_db.__setitem__, session_id, {
             "quiz_id": quiz_id,
             "shareable_link": f"/student/quiz/{session_id}",
             "is_active": True,
-            "created_at": datetime.now().isoformat()
-        }
+            "created_at": datetime.now().isoformat(),
+            "time_limit": full_quiz["time_limit"]
+        })
 
         return {
             "quiz_id": quiz_id,
@@ -84,22 +79,17 @@ async def generate_quiz(
             "quiz": full_quiz,  # Include the full quiz in response
             "message": "Quiz generated successfully"
         }
+    except ExtractionBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Helper functions remain the same...
-def extract_text_from_pdf(file):
-    reader = PyPDF2.PdfReader(file)
-    return "".join(page.extract_text() for page in reader.pages)
-
-def extract_text_from_docx(file):
-    doc = docx.Document(io.BytesIO(file.read()))
-    return "\n".join(para.text for para in doc.paragraphs)
-
 async def generate_quiz_with_ai(**params):
     prompt = build_quiz_prompt(**params)
     
-    response = await client.chat.completions.create(
+    response = await llm_gateway.chat(
+        priority=Priority.INTERACTIVE_TEACHER,
         model="gpt-4.1-nano",
         messages=[
             {"role": "system", "content": "You are a helpful quiz generator."},
@@ -3,6 +3,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from datetime import datetime
 import uuid
 from app.core.database import get_quizzes_db, get_active_quizzes_db, get_student_responses_db
+from app.core.quiz_store import QuizStore
 from app.models.quizmodels import QuizResponse, GradedResponse  # Import shared models
 
 router = APIRouter(
@@ -10,11 +11,13 @@ router = APIRouter(
     tags=["Quiz Grading"]
 )
 
+# These handlers only touch the quiz stores, which may be database-backed, so they
+# are plain functions and run in the threadpool instead of on the event loop.
 @router.post("/publish/{quiz_id}")
-async def publish_quiz(
+def publish_quiz(
     quiz_id: str,
-    quizzes_db: dict = Depends(get_quizzes_db),
-    active_quizzes: dict = Depends(get_active_quizzes_db)
+    quizzes_db: QuizStore = Depends(get_quizzes_db),
+    active_quizzes: QuizStore = Depends(get_active_quizzes_db)
 ):
     """Create a new active session for an existing quiz"""
     if quiz_id not in quizzes_db:
@@ -27,7 +30,8 @@ async def publish_quiz(
         "quiz_id": quiz_id,
         "shareable_link": shareable_link,
         "is_active": True,
-        "created_at": datetime.now().isoformat()
+        "created_at": datetime.now().isoformat(),
+        "time_limit": quizzes_db[quiz_id].get("time_limit")  # Lets bounded stores expire the session
     }
     
     return {
@@ -37,31 +41,32 @@ async def publish_quiz(
     }
 
 @router.get("/session/{session_id}")
-async def get_quiz_session(
+def get_quiz_session(
     session_id: str,
-    quizzes_db: dict = Depends(get_quizzes_db),
-    active_quizzes: dict = Depends(get_active_quizzes_db)
+    quizzes_db: QuizStore = Depends(get_quizzes_db),
+    active_quizzes: QuizStore = Depends(get_active_quizzes_db)
 ):
     """Get quiz for student interface with session context"""
     if session_id not in active_quizzes:
         raise HTTPException(status_code=404, detail="Quiz session not found")
     
     quiz_id = active_quizzes[session_id]["quiz_id"]
-    if quiz_id not in quizzes_db:
+    quiz = quizzes_db.get(quiz_id)
+    if not quiz:
         raise HTTPException(status_code=404, detail="Quiz content not found")
     
     return {
-        **quizzes_db[quiz_id],
+        **quiz,
         "session_id": session_id
     }
 
 @router.post("/submit/{session_id}")
-async def submit_quiz(
+def submit_quiz(
     session_id: str,
     response: QuizResponse,
-    quizzes_db: dict = Depends(get_quizzes_db),
-    active_quizzes: dict = Depends(get_active_quizzes_db),
-    responses_db: dict = Depends(get_student_responses_db)
+    quizzes_db: QuizStore = Depends(get_quizzes_db),
+    active_quizzes: QuizStore = Depends(get_active_quizzes_db),
+    responses_db: QuizStore = Depends(get_student_responses_db)
 ):
     """Submit and grade quiz responses"""
     if session_id not in active_quizzes:
@@ -98,19 +103,30 @@ async def submit_quiz(
             "explanation": str(question.get("explanation", ""))
         }
     
-    # Store response
-    if session_id not in responses_db:
-        responses_db[session_id] = []
-    responses_db[session_id].append({
+    # Store response; a resubmission replaces the student's earlier one
+    responses_db.append(session_id, {
         "student_id": response.student_id,
         "score": score,
         "timestamp": response.timestamp.isoformat(),
         "answers": response.answers
-    })
+    }, item_key=response.student_id)
     
     return GradedResponse(
         score=score,
         total_questions=len(quiz["questions"]),
         time_per_question=time_per_question,
         feedback=feedback
-    )
\ No newline at end of file
+    )
+
+@router.get("/store-stats")
+def get_store_stats(
+    quizzes_db: QuizStore = Depends(get_quizzes_db),
+    active_quizzes: QuizStore = Depends(get_active_quizzes_db),
+    responses_db: QuizStore = Depends(get_student_responses_db)
+):
+    """Entry counts and approximate memory used by the quiz stores"""
+    return {
+        "quizzes": quizzes_db.stats(),
+        "active_quizzes": active_quizzes.stats(),
+        "student_responses": responses_db.stats()
+    }
@@ -1,13 +1,13 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
-from openai import AsyncOpenAI
 from app.core.config import settings
+from app.services.llm_gateway import llm_gateway
+from app.services.llm_scheduler import Priority
 
 router = APIRouter(
     prefix="/assignments"
     )
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
 
 # Input from frontend
 class HintResponseRequest(BaseModel):
@@ -50,7 +50,8 @@ async def evaluate_hint_response(payload: HintResponseRequest):
     """
 
     try:
-        response = await client.chat.completions.create(
+        response = await llm_gateway.chat(
+            priority=Priority.INTERACTIVE_STUDENT,
             model="gpt-4.1-nano",
             messages=[
                 {"role": "system", "content": "You are a thoughtful educational assistant."},
@@ -1,27 +1,32 @@
 from fastapi import APIRouter, UploadFile, HTTPException, File, Form, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, field_validator
-from typing import Optional, Union
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+import asyncio
 import os
 import re
-from openai import AsyncOpenAI, APIError
+import time
+from openai import APIError
 from app.core.config import settings
 import logging
 from pathlib import Path
 from datetime import datetime
-from PyPDF2 import PdfReader
-from docx import Document
-import io
+from app.services import document_ingestion
+from app.services.extraction_engine import ExtractionBusyError
+from app.services.llm_gateway import llm_gateway
+from app.services.llm_scheduler import Priority
+from app.services.summary_cache import summary_cache
+from app.utils.sse import SSE_HEADERS, format_sse
 
 router = APIRouter()
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Constants
 MAX_TEXT_LENGTH = 100000  # ~100K characters
-ALLOWED_FILE_TYPES = ['.txt', '.pdf', '.docx']
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+ALLOWED_FILE_TYPES = document_ingestion.ALLOWED_FILE_TYPES
+MAX_FILE_SIZE = document_ingestion.MAX_FILE_SIZE
 UPLOAD_DIR = "chatbot_sources"
 SUMMARY_PROMPT = """
 You are an expert educational assistant. Create a clear, structured summary of the given content, tailored to a {complexity} complexity level.
@@ -34,6 +39,23 @@ Your summary must:
 
 Return only the summary, no preamble or explanation.
 """
+# Map-reduce summarization for long documents
+SUMMARY_MODES = ["auto", "single", "chunked"]
+CHUNKED_SUMMARY_THRESHOLD = 20000  # "auto" switches to map-reduce above this many characters
+SUMMARY_CHUNK_SIZE = 12000
+SUMMARY_MAP_CONCURRENCY = 4
+SUMMARY_MAP_MAX_TOKENS = 500
+CHUNK_SUMMARY_PROMPT = """
+You are an expert educational assistant. You will receive one section of a longer document.
+Summarize this section at a {complexity} complexity level, preserving all key ideas, terminology,
+definitions, formulas and examples. Use bullet points.
+
+Return only the summary, no preamble or explanation.
+"""
+MERGE_SUMMARY_PROMPT = SUMMARY_PROMPT + """
+You will receive summaries of consecutive sections of one document. Merge them into a single
+coherent summary that follows the document's order and removes overlap between sections.
+"""
 
 class SummaryRequest(BaseModel):
     text: Optional[str] = None
@@ -54,15 +76,7 @@ class SummaryRequest(BaseModel):
 
 async def sanitize_text(text: str) -> str:
     """Clean and normalize text input"""
-    if not text:
-        return ""
-    
-    # Remove problematic control characters but preserve paragraphs
-    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
-    # Normalize excessive whitespace but keep paragraph breaks
-    text = re.sub(r'(?<!\n)\n(?!\n)', ' ', text)  # Single newlines to space
-    text = re.sub(r'[ \t]+', ' ', text)  # Multiple spaces/tabs to single space
-    return text.strip()
+    return document_ingestion.sanitize_text(text)
 
 # async def handle_file_upload(file: Union[str, UploadFile]) -> str:
 #     """Handle both pre-uploaded files and new uploads"""
@@ -71,78 +85,43 @@ async def sanitize_text(text: str) -> str:
 #     else:  # New UploadFile
 #         return await process_upload_file(file)
 
-async def process_upload_file(file: UploadFile) -> str:
-    """Process a newly uploaded file"""
+async def process_upload_file(
+    file: UploadFile,
+    page_range: Optional[document_ingestion.PageRange] = None
+) -> str:
+    """Process a newly uploaded file, extracting at most MAX_TEXT_LENGTH characters"""
     try:
-        file_ext = Path(file.filename).suffix.lower()
-        if file_ext not in ALLOWED_FILE_TYPES:
-            raise ValueError(f"Unsupported file type: {file_ext}")
-
-        contents = await file.read()
-        if len(contents) > MAX_FILE_SIZE:
-            raise ValueError(f"File exceeds maximum size of {MAX_FILE_SIZE} bytes")
-
-        if file_ext == '.txt':
-            try:
-                text_content = contents.decode('utf-8', errors='ignore')
-            except UnicodeDecodeError:
-                raise ValueError("Could not decode file (invalid UTF-8 encoding)")
-
-        elif file_ext == '.pdf':
-            text_content = extract_text_from_pdf(contents)
-
-        elif file_ext == '.docx':
-            text_content = extract_text_from_docx(contents)
-
-        else:
-            raise ValueError(f"Unsupported file type: {file_ext}")
-
-        return await sanitize_text(text_content)
-
+        return await document_ingestion.ingest_upload(
+            file,
+            max_chars=MAX_TEXT_LENGTH,
+            page_range=page_range
+        )
     except Exception as e:
         logger.error(f"File upload processing failed: {str(e)}")
         raise
 
 
-def extract_text_from_pdf(content: bytes) -> str:
-    try:
-        reader = PdfReader(io.BytesIO(content))
-        text = ''
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + '\n'
-        return text.strip()
-    except Exception as e:
-        logger.error(f"PDF extraction failed: {str(e)}")
-        raise ValueError("Failed to extract text from PDF")
-
+def _summary_messages(system_prompt: str, user_content: str) -> List[Dict[str, str]]:
+    return [
+        {
+            "role": "system",
+            "content": system_prompt
+        },
+        {
+            "role": "user", 
+            "content": user_content
+        }
+    ]
 
-def extract_text_from_docx(content: bytes) -> str:
+async def _complete_summary(system_prompt: str, user_content: str, max_tokens: int = 1000) -> str:
+    """Run a single summarization chat completion"""
     try:
-        doc = Document(io.BytesIO(content))
-        text = '\n'.join([para.text for para in doc.paragraphs])
-        return text.strip()
-    except Exception as e:
-        logger.error(f"DOCX extraction failed: {str(e)}")
-        raise ValueError("Failed to extract text from DOCX")
-async def generate_summary(text: str, complexity: str) -> str:
-    """Generate AI summary using OpenAI"""
-    try:
-        response = await client.chat.completions.create(
+        response = await llm_gateway.chat(
+            priority=Priority.INTERACTIVE_TEACHER,
             model="gpt-4.1-nano",
-            messages=[
-                {
-                    "role": "system",
-                    "content": SUMMARY_PROMPT.format(complexity=complexity)
-                },
-                {
-                    "role": "user", 
-                    "content": f"Summarize this content at {complexity} complexity level:\n\n{text}"
-                }
-            ],
+            messages=_summary_messages(system_prompt, user_content),
             temperature=0.7,
-            max_tokens=1000
+            max_tokens=max_tokens
         )
         
         if not response.choices or not response.choices[0].message.content:
@@ -157,60 +136,237 @@ async def generate_summary(text: str, complexity: str) -> str:
         logger.error(f"Summary generation failed: {str(e)}")
         raise
 
+async def _stream_summary(system_prompt: str, user_content: str, max_tokens: int = 1000) -> AsyncIterator[str]:
+    """Run a summarization chat completion, yielding content deltas as they arrive"""
+    try:
+        async for token in llm_gateway.stream_chat(
+            priority=Priority.INTERACTIVE_TEACHER,
+            model="gpt-4.1-nano",
+            messages=_summary_messages(system_prompt, user_content),
+            temperature=0.7,
+            max_tokens=max_tokens
+        ):
+            yield token
+
+    except APIError as e:
+        logger.error(f"OpenAI API error: {e.status_code} - {e.message}")
+        raise
+    except Exception as e:
+        logger.error(f"Summary streaming failed: {str(e)}")
+        raise
+
+def _single_summary_input(text: str, complexity: str) -> Tuple[str, str]:
+    return (
+        SUMMARY_PROMPT.format(complexity=complexity),
+        f"Summarize this content at {complexity} complexity level:\n\n{text}"
+    )
+
+def _merge_summary_input(partial_summaries: List[str], complexity: str) -> Tuple[str, str]:
+    return (
+        MERGE_SUMMARY_PROMPT.format(complexity=complexity),
+        "\n\n".join(
+            f"Section {i + 1}:\n{partial}" for i, partial in enumerate(partial_summaries)
+        )
+    )
+
+async def generate_summary(text: str, complexity: str) -> str:
+    """Generate AI summary using OpenAI"""
+    return await _complete_summary(*_single_summary_input(text, complexity))
+
+def _split_long_paragraph(paragraph: str, max_chars: int) -> List[str]:
+    """Split an oversized paragraph on sentence boundaries, hard-slicing runaway sentences"""
+    pieces = []
+    current = ""
+    for sentence in re.split(r'(?<=[.!?])\s+', paragraph):
+        if len(sentence) > max_chars:
+            # Flush pending text first so the slices keep their place in the document
+            if current:
+                pieces.append(current)
+                current = ""
+            while len(sentence) > max_chars:
+                pieces.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+def split_into_chunks(text: str, max_chars: int = SUMMARY_CHUNK_SIZE) -> List[str]:
+    """Group paragraphs into chunks of at most max_chars characters"""
+    chunks = []
+    current = []
+    current_len = 0
+    for paragraph in (p.strip() for p in text.split("\n\n")):
+        if not paragraph:
+            continue
+        for piece in _split_long_paragraph(paragraph, max_chars) if len(paragraph) > max_chars else [paragraph]:
+            if current and current_len + len(piece) + 2 > max_chars:
+                chunks.append("\n\n".join(current))
+                current = []
+                current_len = 0
+            current.append(piece)
+            current_len += len(piece) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+async def summarize_chunks(chunks: List[str], complexity: str) -> List[str]:
+    """Map phase: summarize chunks concurrently, bounded by SUMMARY_MAP_CONCURRENCY"""
+    semaphore = asyncio.Semaphore(SUMMARY_MAP_CONCURRENCY)
+
+    async def summarize_chunk(index: int, chunk: str) -> str:
+        async with semaphore:
+            return await _complete_summary(
+                CHUNK_SUMMARY_PROMPT.format(complexity=complexity),
+                f"Section {index + 1} of {len(chunks)}:\n\n{chunk}",
+                max_tokens=SUMMARY_MAP_MAX_TOKENS
+            )
+
+    return await asyncio.gather(
+        *(summarize_chunk(i, chunk) for i, chunk in enumerate(chunks))
+    )
+
+async def generate_chunked_summary(text: str, complexity: str) -> Tuple[str, Dict]:
+    """
+    Map-reduce summarization for long documents:
+    - map: summarize paragraph-aligned chunks concurrently (bounded by SUMMARY_MAP_CONCURRENCY)
+    - reduce: merge the partial summaries into one final summary
+
+    Returns the summary and per-phase timing stats.
+    """
+    chunks = split_into_chunks(text)
+
+    map_start = time.perf_counter()
+    partial_summaries = await summarize_chunks(chunks, complexity)
+    map_time = time.perf_counter() - map_start
+
+    reduce_start = time.perf_counter()
+    if len(partial_summaries) == 1:
+        summary = partial_summaries[0]
+    else:
+        summary = await _complete_summary(*_merge_summary_input(partial_summaries, complexity))
+    reduce_time = time.perf_counter() - reduce_start
+
+    return summary, {
+        "chunk_count": len(chunks),
+        "map_time": f"{map_time:.2f}s",
+        "reduce_time": f"{reduce_time:.2f}s"
+    }
+
+async def collect_summary_content(
+    text: Optional[str],
+    file: Optional[UploadFile],
+    page_start: Optional[int],
+    page_end: Optional[int],
+    mode: str
+) -> str:
+    """Validate summary inputs and return the combined, sanitized content"""
+    # Validate at least one input exists
+    if not text and not file:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Either text or file must be provided"
+        )
+    if mode not in SUMMARY_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Mode must be one of: {', '.join(SUMMARY_MODES)}"
+        )
+
+    # Process text content
+    text_content = await sanitize_text(text) if text else ""
+
+    # Process file if provided
+    file_content = ""
+    if file:
+        try:
+            page_range = (page_start, page_end) if page_start or page_end else None
+            file_content = await process_upload_file(file, page_range)
+        except ExtractionBusyError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e)
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Could not process file: {str(e)}"
+            )
+
+    # Combine content
+    final_content = "\n\n".join(filter(None, [text_content, file_content]))
+    if not final_content.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No valid content could be extracted from inputs"
+        )
+    return final_content
+
+def resolve_summary_mode(mode: str, content: str) -> str:
+    if mode == "auto":
+        return "chunked" if len(content) > CHUNKED_SUMMARY_THRESHOLD else "single"
+    return mode
+
 @router.post("/")
 async def summarize_chapter(
     text: Optional[str] = Form(None),
     file: Optional[UploadFile] = File(None),
-    complexity: str = Form("medium")
+    complexity: str = Form("medium"),
+    page_start: Optional[int] = Form(None),
+    page_end: Optional[int] = Form(None),
+    mode: str = Form("auto")
 ):
     """
     Generate a summary from either:
     - Direct text input (form field)
-    - File upload (optional)
+    - File upload (optional), limited to pages page_start..page_end for PDFs
     - Or both
+
+    mode is "single" (one completion), "chunked" (map-reduce over paragraph
+    chunks) or "auto" (chunked above CHUNKED_SUMMARY_THRESHOLD characters).
     
-    Returns summary with original and summary length metrics.
+    Returns summary with original and summary length metrics and per-phase timings.
     """
     try:
         logger.info(f"Summary request received for complexity: {complexity}")
 
-        # Validate at least one input exists
-        if not text and not file:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Either text or file must be provided"
-            )
+        extraction_start = time.perf_counter()
+        final_content = await collect_summary_content(text, file, page_start, page_end, mode)
+        extraction_time = time.perf_counter() - extraction_start
+        mode = resolve_summary_mode(mode, final_content)
 
-        # Process text content
-        text_content = await sanitize_text(text) if text else ""
-
-        # Process file if provided
-        file_content = ""
-        if file:
-            try:
-                file_content = await process_upload_file(file)
-            except Exception as e:
-                raise HTTPException(
-                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                    detail=f"Could not process file: {str(e)}"
-                )
-
-        # Combine content
-        final_content = "\n\n".join(filter(None, [text_content, file_content]))
-        if not final_content.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="No valid content could be extracted from inputs"
-            )
+        cached_summary = await summary_cache.get(final_content, complexity, mode)
+        if cached_summary is not None:
+            logger.info(f"Summary cache hit ({len(final_content)} chars, {complexity}, {mode})")
+            return {
+                "summary": cached_summary,
+                "original_length": len(final_content),
+                "summary_length": len(cached_summary),
+                "complexity": complexity,
+                "mode": mode,
+                "processing_time": f"{time.perf_counter() - extraction_start:.2f}s",
+                "timings": {"extraction_time": f"{extraction_time:.2f}s"},
+                "cached": True
+            }
 
         # Generate summary
         try:
             start_time = datetime.now()
-            summary = await generate_summary(final_content, complexity)
+            timings = {"extraction_time": f"{extraction_time:.2f}s"}
+            if mode == "chunked":
+                summary, phase_stats = await generate_chunked_summary(final_content, complexity)
+                timings.update(phase_stats)
+            else:
+                summary = await generate_summary(final_content, complexity)
             duration = (datetime.now() - start_time).total_seconds()
+            await summary_cache.set(final_content, complexity, mode, summary)
             
             logger.info(
-                f"Generated summary in {duration:.2f}s. "
+                f"Generated {mode} summary in {duration:.2f}s. "
                 f"Original: {len(final_content)} chars, "
                 f"Summary: {len(summary)} chars"
             )
@@ -220,7 +376,10 @@ async def summarize_chapter(
                 "original_length": len(final_content),
                 "summary_length": len(summary),
                 "complexity": complexity,
-                "processing_time": f"{duration:.2f}s"
+                "mode": mode,
+                "processing_time": f"{duration:.2f}s",
+                "timings": timings,
+                "cached": False
             }
             
         except APIError as e:
@@ -241,4 +400,97 @@ async def summarize_chapter(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected error occurred"
-        )
\ No newline at end of file
+        )
+
+@router.post("/stream")
+async def summarize_chapter_stream(
+    text: Optional[str] = Form(None),
+    file: Optional[UploadFile] = File(None),
+    complexity: str = Form("medium"),
+    page_start: Optional[int] = Form(None),
+    page_end: Optional[int] = Form(None),
+    mode: str = Form("auto")
+):
+    """
+    Streaming variant of summarize_chapter over Server-Sent Events.
+
+    Emits "token" events as the summary is generated ("progress" events
+    mark the map phase in chunked mode), then a final "done" event with
+    original_length, summary_length and processing_time. Failures after
+    the stream has started are reported as an "error" event.
+    """
+    logger.info(f"Streaming summary request received for complexity: {complexity}")
+
+    extraction_start = time.perf_counter()
+    final_content = await collect_summary_content(text, file, page_start, page_end, mode)
+    extraction_time = time.perf_counter() - extraction_start
+    mode = resolve_summary_mode(mode, final_content)
+
+    async def event_stream() -> AsyncIterator[str]:
+        start_time = time.perf_counter()
+        timings = {"extraction_time": f"{extraction_time:.2f}s"}
+        summary_parts = []
+        cached = False
+        try:
+            cached_summary = await summary_cache.get(final_content, complexity, mode)
+            if cached_summary is not None:
+                cached = True
+                summary_parts.append(cached_summary)
+                yield format_sse({"content": cached_summary}, event="token")
+            elif mode == "chunked":
+                chunks = split_into_chunks(final_content)
+                yield format_sse({"phase": "map", "chunk_count": len(chunks)}, event="progress")
+
+                map_start = time.perf_counter()
+                partial_summaries = await summarize_chunks(chunks, complexity)
+                timings["chunk_count"] = len(chunks)
+                timings["map_time"] = f"{time.perf_counter() - map_start:.2f}s"
+                yield format_sse({"phase": "reduce"}, event="progress")
+
+                reduce_start = time.perf_counter()
+                if len(partial_summaries) == 1:
+                    summary_parts.append(partial_summaries[0])
+                    yield format_sse({"content": partial_summaries[0]}, event="token")
+                else:
+                    async for token in _stream_summary(*_merge_summary_input(partial_summaries, complexity)):
+                        summary_parts.append(token)
+                        yield format_sse({"content": token}, event="token")
+                timings["reduce_time"] = f"{time.perf_counter() - reduce_start:.2f}s"
+            else:
+                async for token in _stream_summary(*_single_summary_input(final_content, complexity)):
+                    summary_parts.append(token)
+                    yield format_sse({"content": token}, event="token")
+
+            if not cached:
+                await summary_cache.set(final_content, complexity, mode, "".join(summary_parts))
+
+            summary_length = sum(len(part) for part in summary_parts)
+            duration = time.perf_counter() - start_time
+            logger.info(
+                f"Streamed {mode} summary in {duration:.2f}s. "
+                f"Original: {len(final_content)} chars, "
+                f"Summary: {summary_length} chars"
+            )
+            yield format_sse({
+                "original_length": len(final_content),
+                "summary_length": summary_length,
+                "complexity": complexity,
+                "mode": mode,
+                "processing_time": f"{duration:.2f}s",
+                "timings": timings,
+                "cached": cached
+            }, event="done")
+
+        except APIError:
+            yield format_sse({"detail": "Error processing your request with the AI service"}, event="error")
+        except Exception as e:
+            logger.critical(f"Unexpected error while streaming summary: {str(e)}", exc_info=True)
+            yield format_sse({"detail": "Failed to generate summary"}, event="error")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.get("/cache-stats")
+async def get_summary_cache_stats():
+    """Hit/miss counters for the summary cache"""
+    return summary_cache.stats()
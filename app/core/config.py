@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from openai import OpenAI
+from functools import cached_property
 import os
 
 class Settings(BaseSettings):
@@ -11,9 +12,80 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 30
     OPENAI_API_KEY: str
     REACT_APP_BACKEND_URL: str 
+
+    # Document ingestion
+    EXTRACTION_CACHE_DIR: str = "chatbot_sources/.extracted"
+    EXTRACTION_CACHE_SIZE: int = 64
+    EXTRACTION_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # On-disk tier, least recently used entries are pruned
+    EXTRACTION_WORKERS: int = 2
+    EXTRACTION_TIMEOUT_SECONDS: float = 30.0
+    EXTRACTION_MAX_QUEUE: int = 16
+
+    # Summary cache
+    SUMMARY_CACHE_SIZE: int = 256
+    SUMMARY_CACHE_TTL_SECONDS: int = 6 * 60 * 60
+    # Rows in the summary_cache table; expired rows are ignored on read and purged periodically
+    SUMMARY_CACHE_DB_TTL_SECONDS: int = 30 * 24 * 60 * 60
+
+    # Assignment generation
+    PROBING_CONCURRENCY: int = 4
+    SESSION_PAYLOAD_CACHE_SIZE: int = 512
+    ANSWER_KEY_CACHE_SIZE: int = 512
+    # Invalidation is per process; the TTL bounds how long other workers serve stale content
+    ASSIGNMENT_CACHE_TTL_SECONDS: int = 300
+    GRADING_NUMERIC_TOLERANCE: float = 1e-6
+
+    # Write-behind submission persistence
+    SUBMISSION_WRITE_BEHIND: bool = False
+    SUBMISSION_QUEUE_MAX: int = 1000
+    SUBMISSION_BATCH_SIZE: int = 100
+    SUBMISSION_FLUSH_INTERVAL_SECONDS: float = 0.5
+    SUBMISSION_SPILL_PATH: str = "logs/unsaved_submissions.jsonl"
+
+    # Quiz storage: "memory", "postgres" or "sqlite"
+    QUIZ_STORE_BACKEND: str = "memory"
+    QUIZ_STORE_SQLITE_PATH: str = "quiz_store.db"
+    QUIZ_STORE_CACHE_SIZE: int = 1024
+    QUIZ_STORE_CACHE_TTL_SECONDS: int = 30
+    # Limits for the "memory" backend, applied per namespace
+    QUIZ_STORE_MAX_BYTES: int = 64 * 1024 * 1024
+    QUIZ_STORE_DEFAULT_TTL_SECONDS: int = 24 * 60 * 60
+    QUIZ_STORE_SESSION_GRACE_SECONDS: int = 10 * 60
+    QUIZ_STORE_SPILL_DIR: str = "logs/quiz_store"
+
+    # Chatbot retrieval
+    CHATBOT_INDEX_DIR: str = "chatbot_sources/.index"
+    CHATBOT_INDEX_CACHE_SIZE: int = 64
+    CHATBOT_CHUNK_CHARS: int = 1200
+    CHATBOT_CHUNK_OVERLAP: int = 200
+    CHATBOT_TOP_K: int = 4
+    CHATBOT_CONFIG_CACHE_SIZE: int = 1024
+    CHATBOT_CONFIG_CACHE_TTL_SECONDS: int = 60
+    ANSWER_CACHE_SIZE: int = 2048
+    ANSWER_CACHE_TTL_SECONDS: int = 60 * 60
+    ANSWER_CACHE_SIMILARITY: float = 0.8
+    CHAT_SESSION_MAX: int = 5000
+    CHAT_SESSION_IDLE_SECONDS: int = 30 * 60
+    CHAT_SESSION_TOKEN_BUDGET: int = 1500
+    CHAT_SESSION_RECENT_TURNS: int = 3
+    CHAT_SESSION_SUMMARY_TOKENS: int = 200
+
+    # LLM gateway (shared OpenAI client)
+    LLM_MAX_CONCURRENCY: int = 16
+    # Match the OpenAI account tier; 0 disables a limit
+    LLM_REQUESTS_PER_MINUTE: int = 500
+    LLM_TOKENS_PER_MINUTE: int = 200000
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BASE_SECONDS: float = 0.5
+    LLM_RETRY_MAX_SECONDS: float = 8.0
+    LLM_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    LLM_READ_TIMEOUT_SECONDS: float = 60.0
+    LLM_MAX_CONNECTIONS: int = 32
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 16
     
-    @property
+    @cached_property
     def openai_client(self):
+        # Built once; async code should go through app.services.llm_gateway instead
         return OpenAI(api_key=self.OPENAI_API_KEY)
     
     class Config:
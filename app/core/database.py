@@ -1,10 +1,11 @@
 from typing import Dict, Any
+from app.core.quiz_store import QuizStore, create_quiz_store
 
 
-# In-memory storage
-quizzes_db: Dict[str, Any] = {}
-active_quizzes_db: Dict[str, Any] = {}
-student_responses_db: Dict[str, Any] = {}
+# Quiz storage (bounded in-memory by default, see QUIZ_STORE_BACKEND)
+quizzes_db: QuizStore = create_quiz_store("quizzes")
+active_quizzes_db: QuizStore = create_quiz_store("active_quizzes")
+student_responses_db: QuizStore = create_quiz_store("student_responses")
 
 # Database access functions
 def get_quizzes_db():
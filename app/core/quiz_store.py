@@ -0,0 +1,407 @@
+import abc
+import copy
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db.models.quiz_store import QuizStoreEntry, QuizStoreItem
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class QuizStore(MutableMapping):
+    """Key/value storage behind the quiz routers.
+
+    Stores behave like dicts of JSON-serializable values. Values read from a
+    store are copies, so changes must be written back with ``store[key] = value``,
+    or with ``append`` for list values. ``MutableMapping`` is an ABC, so
+    subclasses must implement the mapping methods as well as ``append``.
+    """
+
+    @abc.abstractmethod
+    def append(self, key: str, item: Any, item_key: Optional[str] = None) -> None:
+        """Append ``item`` to the list stored under ``key``, creating it if needed.
+
+        An earlier item appended under the same ``item_key`` (e.g. a student's
+        previous submission) is replaced in place.
+        """
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count and backend-specific usage figures"""
+        return {"entries": len(self)}
+
+
+def approximate_size(key: str, value: Any) -> int:
+    """Rough memory footprint of an entry, measured as its JSON encoding"""
+    return len(key) + len(json.dumps(value, default=str))
+
+
+class BoundedMemoryQuizStore(QuizStore):
+    """Process-local store with per-entry expiry and an approximate memory cap.
+
+    Values carrying ``created_at`` and ``time_limit`` (active quiz sessions)
+    expire ``grace`` seconds after the quiz closes; everything else lives for
+    ``default_ttl`` seconds from when it was first written. When the store goes
+    over ``max_bytes`` the least recently used entries are evicted. Expired and
+    evicted entries are appended to ``spill_path`` as JSON lines when one is set,
+    so student responses are not lost.
+    """
+
+    SWEEP_INTERVAL = 60
+
+    def __init__(
+        self,
+        namespace: str,
+        max_bytes: int,
+        default_ttl: float,
+        grace: float = 0,
+        spill_path: Optional[str] = None
+    ):
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.grace = grace
+        self.spill_path = spill_path
+        # key -> (value, approximate size, expires_at as a wall-clock timestamp)
+        self._data: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        # key -> item_key -> position in the list, for lists built with append
+        self._item_positions: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._bytes = 0
+        self._next_sweep = time.time() + self.SWEEP_INTERVAL
+        self.evictions = 0
+        self.expirations = 0
+        self.spilled = 0
+
+    def _expires_at(self, value: Any, now: float) -> float:
+        if isinstance(value, dict) and value.get("created_at") and value.get("time_limit"):
+            try:
+                created_at = datetime.fromisoformat(value["created_at"]).timestamp()
+                return created_at + float(value["time_limit"]) + self.grace
+            except (TypeError, ValueError):
+                pass
+        return now + self.default_ttl
+
+    def _remove(self, key: str) -> Tuple[Any, int, float]:
+        entry = self._data.pop(key)
+        self._item_positions.pop(key, None)
+        self._bytes -= entry[1]
+        return entry
+
+    def _collect_expired(self, now: float, force: bool = False) -> List[Tuple[str, Any, str]]:
+        """Drop expired entries; called with the lock held"""
+        if now < self._next_sweep and not force:
+            return []
+        self._next_sweep = now + self.SWEEP_INTERVAL
+        expired = [key for key, (_, _, expires_at) in self._data.items() if expires_at <= now]
+        self.expirations += len(expired)
+        return [(key, self._remove(key)[0], "expired") for key in expired]
+
+    def _collect_overflow(self) -> List[Tuple[str, Any, str]]:
+        """Evict least recently used entries until under the cap; called with the lock held"""
+        evicted = []
+        # Always keep the newest entry, even if it alone exceeds the cap
+        while self._bytes > self.max_bytes and len(self._data) > 1:
+            key = next(iter(self._data))
+            evicted.append((key, self._remove(key)[0], "evicted"))
+        self.evictions += len(evicted)
+        return evicted
+
+    def _spill(self, dropped: List[Tuple[str, Any, str]]) -> None:
+        if not dropped or not self.spill_path:
+            return
+        evicted_at = datetime.now().isoformat()
+        try:
+            with self._spill_lock:
+                os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+                with open(self.spill_path, "a", encoding="utf-8") as f:
+                    for key, value, reason in dropped:
+                        f.write(json.dumps({
+                            "namespace": self.namespace,
+                            "key": key,
+                            "reason": reason,
+                            "evicted_at": evicted_at,
+                            "value": value
+                        }, default=str) + "\n")
+            self.spilled += len(dropped)
+        except OSError:
+            logger.exception("Could not spill %d %s entries to %s", len(dropped), self.namespace, self.spill_path)
+
+    def __getitem__(self, key: str) -> Any:
+        dropped = []
+        try:
+            with self._lock:
+                value, _, expires_at = self._data[key]
+                if expires_at <= time.time():
+                    self._remove(key)
+                    self.expirations += 1
+                    dropped.append((key, value, "expired"))
+                    raise KeyError(key)
+                self._data.move_to_end(key)
+                # A copy, so callers can't change a stored value behind the byte accounting
+                return copy.deepcopy(value)
+        finally:
+            self._spill(dropped)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        size = approximate_size(key, value)
+        value = copy.deepcopy(value)
+        now = time.time()
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, self._expires_at(value, now))
+            self._bytes += size
+            dropped = self._collect_expired(now) + self._collect_overflow()
+        self._spill(dropped)
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def __iter__(self) -> Iterator[str]:
+        now = time.time()
+        with self._lock:
+            return iter([key for key, (_, _, expires_at) in self._data.items() if expires_at > now])
+
+    def __len__(self) -> int:
+        now = time.time()
+        with self._lock:
+            return sum(1 for _, _, expires_at in self._data.values() if expires_at > now)
+
+    def purge_expired(self) -> None:
+        """Drop (and spill) every expired entry now instead of at the next sweep"""
+        with self._lock:
+            dropped = self._collect_expired(time.time(), force=True)
+        self._spill(dropped)
+
+    def append(self, key: str, item: Any, item_key: Optional[str] = None) -> None:
+        # Each list item costs its own encoding plus a separator
+        size = len(json.dumps(item, default=str)) + 2
+        item = copy.deepcopy(item)
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[2] <= now:
+                if entry is not None:
+                    self._remove(key)
+                self._data[key] = ([item], approximate_size(key, [item]), now + self.default_ttl)
+                self._bytes += self._data[key][1]
+                if item_key is not None:
+                    self._item_positions[key] = {item_key: 0}
+                dropped = [(key, entry[0], "expired")] if entry is not None else []
+            else:
+                value, old_size, expires_at = entry
+                positions = self._item_positions.setdefault(key, {})
+                position = positions.get(item_key) if item_key is not None else None
+                if position is None:
+                    value.append(item)
+                    if item_key is not None:
+                        positions[item_key] = len(value) - 1
+                else:
+                    size -= len(json.dumps(value[position], default=str)) + 2
+                    value[position] = item
+                self._data[key] = (value, old_size + size, expires_at)
+                self._data.move_to_end(key)
+                self._bytes += size
+                dropped = []
+            dropped += self._collect_expired(now) + self._collect_overflow()
+        self._spill(dropped)
+
+    def stats(self) -> Dict[str, Any]:
+        # Count live quizzes only, not entries waiting for the next sweep
+        self.purge_expired()
+        return {
+            "backend": "memory",
+            "entries": len(self._data),
+            "approx_bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "spilled": self.spilled
+        }
+
+
+class SQLQuizStore(QuizStore):
+    """One namespace of the ``quiz_store`` table (Postgres in production, SQLite locally).
+
+    Lists built with ``append`` live in ``quiz_store_items``, one row per item,
+    so appending is a single-row insert or update rather than a rewrite of the
+    whole list under a lock shared by everyone writing to the same key.
+    """
+
+    def __init__(self, session_factory: sessionmaker, namespace: str):
+        self._session_factory = session_factory
+        self.namespace = namespace
+
+    def _query(self, db):
+        return db.query(QuizStoreEntry).filter(QuizStoreEntry.namespace == self.namespace)
+
+    def _items(self, db):
+        return db.query(QuizStoreItem).filter(QuizStoreItem.namespace == self.namespace)
+
+    def __getitem__(self, key: str) -> Any:
+        with self._session_factory() as db:
+            entry = db.get(QuizStoreEntry, (self.namespace, key))
+            if entry is not None:
+                return entry.value
+            items = [
+                value for (value,) in
+                self._items(db).filter(QuizStoreItem.key == key).order_by(QuizStoreItem.id).with_entities(QuizStoreItem.value)
+            ]
+        if not items:
+            raise KeyError(key)
+        return items
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        with self._session_factory() as db:
+            self._items(db).filter(QuizStoreItem.key == key).delete()
+            db.merge(QuizStoreEntry(namespace=self.namespace, key=key, value=value))
+            db.commit()
+
+    def __delitem__(self, key: str) -> None:
+        with self._session_factory() as db:
+            deleted = self._query(db).filter(QuizStoreEntry.key == key).delete()
+            deleted += self._items(db).filter(QuizStoreItem.key == key).delete()
+            db.commit()
+        if not deleted:
+            raise KeyError(key)
+
+    def _keys(self, db) -> List[str]:
+        keys = [key for (key,) in self._query(db).with_entities(QuizStoreEntry.key)]
+        keys += [key for (key,) in self._items(db).with_entities(QuizStoreItem.key).distinct()]
+        return list(dict.fromkeys(keys))
+
+    def __iter__(self) -> Iterator[str]:
+        with self._session_factory() as db:
+            keys = self._keys(db)
+        return iter(keys)
+
+    def __len__(self) -> int:
+        with self._session_factory() as db:
+            return len(self._keys(db))
+
+    def append(self, key: str, item: Any, item_key: Optional[str] = None) -> None:
+        item_key = item_key if item_key is not None else uuid.uuid4().hex
+        for attempt in range(2):
+            with self._session_factory() as db:
+                updated = (
+                    self._items(db)
+                    .filter(QuizStoreItem.key == key, QuizStoreItem.item_key == item_key)
+                    .update({QuizStoreItem.value: item}, synchronize_session=False)
+                )
+                if not updated:
+                    db.add(QuizStoreItem(namespace=self.namespace, key=key, item_key=item_key, value=item))
+                try:
+                    db.commit()
+                    return
+                except IntegrityError:
+                    # The same item_key was inserted concurrently; retry as an update
+                    db.rollback()
+                    if attempt:
+                        raise
+
+
+class CachedQuizStore(QuizStore):
+    """Read-through LRU in front of a shared backend for hot quiz sessions.
+
+    Entries expire after ``ttl`` seconds so other workers' updates become
+    visible; writes from this process update the cache immediately.
+    """
+
+    def __init__(self, backend: QuizStore, maxsize: int, ttl: int):
+        self.backend = backend
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.cache.get(key)
+        if value is None:
+            value = self.backend[key]
+            self.cache.set(key, value)
+        return copy.deepcopy(value)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.backend[key] = value
+        self.cache.set(key, copy.deepcopy(value))
+
+    def __delitem__(self, key: str) -> None:
+        self.cache.pop(key)
+        del self.backend[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.backend)
+
+    def __len__(self) -> int:
+        return len(self.backend)
+
+    def append(self, key: str, item: Any, item_key: Optional[str] = None) -> None:
+        self.backend.append(key, item, item_key)
+        self.cache.pop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": settings.QUIZ_STORE_BACKEND,
+            "entries": len(self.backend),
+            "cache": self.cache.stats()
+        }
+
+
+_session_factory = None
+
+
+def _get_session_factory() -> sessionmaker:
+    global _session_factory
+    if _session_factory is None:
+        if settings.QUIZ_STORE_BACKEND == "sqlite":
+            engine = create_engine(
+                f"sqlite:///{settings.QUIZ_STORE_SQLITE_PATH}",
+                connect_args={"check_same_thread": False}
+            )
+            # Local development only; Postgres gets the table from Alembic
+            QuizStoreEntry.__table__.create(bind=engine, checkfirst=True)
+            QuizStoreItem.__table__.create(bind=engine, checkfirst=True)
+        else:
+            from app.database import engine
+        _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    return _session_factory
+
+
+# Namespaces whose evicted entries are worth keeping on disk
+SPILLED_NAMESPACES = {"student_responses"}
+
+
+def create_quiz_store(namespace: str) -> QuizStore:
+    """Build the store for one namespace according to QUIZ_STORE_BACKEND"""
+    backend = settings.QUIZ_STORE_BACKEND
+    if backend == "memory":
+        spill_path = None
+        if settings.QUIZ_STORE_SPILL_DIR and namespace in SPILLED_NAMESPACES:
+            spill_path = os.path.join(settings.QUIZ_STORE_SPILL_DIR, f"{namespace}.jsonl")
+        return BoundedMemoryQuizStore(
+            namespace,
+            max_bytes=settings.QUIZ_STORE_MAX_BYTES,
+            default_ttl=settings.QUIZ_STORE_DEFAULT_TTL_SECONDS,
+            grace=settings.QUIZ_STORE_SESSION_GRACE_SECONDS,
+            spill_path=spill_path
+        )
+    if backend in ("postgres", "sqlite"):
+        return CachedQuizStore(
+            SQLQuizStore(_get_session_factory(), namespace),
+            maxsize=settings.QUIZ_STORE_CACHE_SIZE,
+            ttl=settings.QUIZ_STORE_CACHE_TTL_SECONDS
+        )
+    raise ValueError(f"Unknown QUIZ_STORE_BACKEND: {backend}")
@@ -1,6 +1,6 @@
 # backend/app/crud/assignment.py
 
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
 from app.db.models.assignment import (
     Assignment,
     AssignmentQuestion,
@@ -84,6 +84,16 @@ def get_active_assignment(db: Session, session_id: str):
     return db.query(ActiveAssignment).filter(ActiveAssignment.session_id == session_id).first()
 
 # --- StudentSubmission CRUD ---
+def get_submission_with_assignment(db: Session, submission_id: str) -> Optional[StudentSubmission]:
+    """Submission with its assignment joined in and the assignment's questions selectin-loaded (2 queries)"""
+    return (
+        db.query(StudentSubmission)
+        .options(joinedload(StudentSubmission.assignment).selectinload(Assignment.questions))
+        .filter(StudentSubmission.id == submission_id)
+        .first()
+    )
+
+
 def save_student_submission(
     db: Session,
     assignment_id: UUID,
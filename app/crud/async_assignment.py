@@ -0,0 +1,204 @@
+# backend/app/crud/async_assignment.py
+# AsyncSession versions of the CRUD operations used by the async assignment routes.
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from app.db.models.assignment import (
+    Assignment,
+    AssignmentQuestion,
+    ActiveAssignment,
+    StudentSubmission,
+    ProbingQuestion
+)
+import uuid
+from uuid import UUID
+from typing import List, Dict, Any, Optional, Union
+import json
+from datetime import datetime, timezone
+
+# --- Assignment CRUD ---
+async def create_assignment(
+    db: AsyncSession,
+    title: str,
+    subject: str,
+    question_count: int,
+    status: str,
+    topic: str = "general",
+    difficulty: str = "medium",
+    class_grade: Optional[str] = None,
+    teacher_id: Optional[UUID] = None
+):
+    db_assignment = Assignment(
+        title=title,
+        subject=subject,
+        question_count=question_count,
+        status=status,
+        topic=topic,
+        difficulty=difficulty,
+        class_grade=class_grade,
+        teacher_id=teacher_id
+    )
+    db.add(db_assignment)
+    await db.commit()
+    await db.refresh(db_assignment)
+    return db_assignment
+
+async def get_assignment(db: AsyncSession, assignment_id: UUID) -> Optional[Assignment]:
+    try:
+        return await db.get(Assignment, assignment_id)
+    except ValueError:
+        return None
+
+async def get_assignment_with_teacher(db: AsyncSession, assignment_id: UUID) -> Optional[Assignment]:
+    """Assignment with its teacher joined in, in one query"""
+    result = await db.execute(
+        select(Assignment)
+        .options(joinedload(Assignment.teacher))
+        .where(Assignment.id == assignment_id)
+    )
+    return result.scalars().first()
+
+async def add_questions(db: AsyncSession, assignment_id: str, questions: List[dict]):
+    saved_questions = []
+
+    for q in questions:
+        question = AssignmentQuestion(
+            id=str(uuid.uuid4()),
+            assignment_id=assignment_id,
+            text=q['text'],
+            answer=q['answer'],
+            explanation=q.get('explanation'),
+            type=q.get('type'),
+        )
+        db.add(question)
+        saved_questions.append(question)
+
+    await db.commit()
+    return saved_questions
+
+# --- ActiveAssignment CRUD ---
+async def create_active_assignment(db: AsyncSession, assignment_id: str, teacher_id: str):
+    session_id = str(uuid.uuid4())
+    db_active = ActiveAssignment(
+        session_id=session_id,
+        assignment_id=assignment_id,
+        teacher_id=teacher_id,
+        activated_at=datetime.now(timezone.utc)
+    )
+    db.add(db_active)
+    await db.commit()
+    await db.refresh(db_active)
+    return db_active
+
+async def get_active_assignment_with_content(
+    db: AsyncSession,
+    session_id: str,
+    with_probing: bool = True
+) -> Optional[ActiveAssignment]:
+    """
+    Active assignment with its assignment, questions and (optionally) their
+    probing questions eagerly loaded: a fixed 3-4 queries regardless of how
+    many questions the assignment has.
+    """
+    questions_loader = selectinload(ActiveAssignment.assignment).selectinload(Assignment.questions)
+    if with_probing:
+        questions_loader = questions_loader.selectinload(AssignmentQuestion.probing_questions)
+
+    result = await db.execute(
+        select(ActiveAssignment)
+        .options(questions_loader)
+        .where(ActiveAssignment.session_id == session_id)
+        .limit(1)
+        # Re-run the eager loaders even if the session already holds these objects
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+async def get_submissions_by_assignment_id(db: AsyncSession, assignment_id: UUID) -> List[StudentSubmission]:
+    result = await db.execute(
+        select(StudentSubmission).where(StudentSubmission.assignment_id == assignment_id)
+    )
+    return list(result.scalars().all())
+
+# --- StudentSubmission CRUD ---
+def serialize_interactions(interactions: Dict[str, Any]) -> Dict[str, Any]:
+    serialized = {}
+    for qid, interaction_list in interactions.items():
+        serialized[qid] = [
+            i.dict() if hasattr(i, "dict") else i  # Pydantic objects
+            for i in interaction_list
+        ]
+    return serialized
+
+def build_submission_row(
+    assignment_id: UUID,
+    session_id: str,
+    student_id: str,
+    score: int,
+    answers: Dict[str, Any],
+    interactions: Dict[str, Any],
+    time_spent: Dict[str, float],
+    submitted_at: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """Column values for one student_submissions row; ``submitted_at`` defaults to now.
+
+    A naive ``submitted_at`` is taken as UTC, so the timestamptz column never
+    depends on the database server's local time.
+    """
+    if submitted_at is not None and submitted_at.tzinfo is None:
+        submitted_at = submitted_at.replace(tzinfo=timezone.utc)
+    return {
+        "id": str(uuid.uuid4()),
+        "assignment_id": assignment_id,
+        "session_id": session_id,
+        "student_id": student_id,
+        "score": score,
+        "answers_json": json.dumps(answers),
+        "interactions_json": json.dumps(serialize_interactions(interactions), default=str),
+        "time_spent_json": json.dumps(time_spent),
+        "submitted_at": submitted_at or datetime.now(timezone.utc)
+    }
+
+async def save_student_submissions_bulk(db: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+    """
+    Insert many submission rows (see build_submission_row) with one multi-row
+    INSERT and one commit. Rows already stored for the same session, student
+    and submission time are skipped, so a retried sync doesn't duplicate them.
+    Returns the number of rows inserted.
+    """
+    if not rows:
+        return 0
+    result = await db.execute(
+        insert(StudentSubmission)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["session_id", "student_id", "submitted_at"])
+    )
+    await db.commit()
+    return result.rowcount
+
+# --- ProbingQuestion CRUD ---
+async def save_probing_questions_bulk(
+    db: AsyncSession,
+    probing_by_question: Dict[str, List[Union[dict, ProbingQuestion]]]
+    ):
+    """Save probing questions for many assignment questions with a single commit"""
+    probing_objs = []
+    for question_id, probing_questions in probing_by_question.items():
+        for pq in probing_questions:
+            if isinstance(pq, dict):
+                probing_objs.append(ProbingQuestion(
+                    id=pq.get('id', str(uuid.uuid4())),
+                    question_id=question_id,
+                    text=pq['text'],
+                    hint=pq.get('hint')
+                ))
+            else:
+                pq.question_id = question_id
+                probing_objs.append(pq)
+
+    if probing_objs:
+        db.add_all(probing_objs)
+        await db.commit()
+    return probing_objs
@@ -0,0 +1,40 @@
+# backend/app/crud/chatbot.py
+# AsyncSession CRUD for persisted chatbot configs.
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.chatbot import ChatbotConfigRecord
+from typing import Optional
+from datetime import datetime, timezone
+
+async def get_chatbot_config(db: AsyncSession, chapter_id: str) -> Optional[ChatbotConfigRecord]:
+    return await db.get(ChatbotConfigRecord, chapter_id)
+
+async def upsert_chatbot_config(
+    db: AsyncSession,
+    chapter_id: str,
+    teacher_id: str,
+    personality: str,
+    tone: str,
+    knowledge_source: Optional[str] = None
+) -> ChatbotConfigRecord:
+    """Create the chapter's chatbot or replace its settings if it already exists"""
+    now = datetime.now(timezone.utc)
+    values = {
+        "teacher_id": teacher_id,
+        "personality": personality,
+        "tone": tone,
+        "knowledge_source": knowledge_source,
+        "updated_at": now
+    }
+    statement = insert(ChatbotConfigRecord).values(
+        chapter_id=chapter_id,
+        created_at=now,
+        **values
+    ).on_conflict_do_update(
+        index_elements=["chapter_id"],
+        set_=values
+    )
+    await db.execute(statement)
+    await db.commit()
+    return await db.get(ChatbotConfigRecord, chapter_id, populate_existing=True)
@@ -1,6 +1,8 @@
 # backend/app/database.py
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 from app.core.config import settings
 import os
 
@@ -15,3 +17,28 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def _async_database_url(url: str) -> str:
+    """Point a sync Postgres URL at the asyncpg driver"""
+    parts = urlsplit(url)
+    scheme = parts.scheme
+    if scheme in ("postgres", "postgresql", "postgresql+psycopg2"):
+        scheme = "postgresql+asyncpg"
+    # asyncpg does not understand libpq's sslmode parameter
+    query = [("ssl", value) if key == "sslmode" else (key, value) for key, value in parse_qsl(parts.query)]
+    return urlunsplit((scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+
+async_engine = create_async_engine(_async_database_url(settings.DATABASE_URL), pool_pre_ping=True)
+AsyncSessionLocal = sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,5 +1,5 @@
 # backend/app/db/models/assignment.py
-from sqlalchemy import Column, String, Integer, Text, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, String, Integer, Text, ForeignKey, DateTime, Boolean, UniqueConstraint
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 from sqlalchemy.dialects.postgresql import UUID, JSONB
@@ -37,6 +37,7 @@ class AssignmentQuestion(Base):
     question_order = Column(Integer, nullable=False, default=0)
 
     assignment = relationship("Assignment", back_populates="questions")
+    probing_questions = relationship("ProbingQuestion", back_populates="question")
 
 class ActiveAssignment(Base):
     __tablename__ = "active_assignments"
@@ -71,6 +72,11 @@ class StudentSubmission(Base):
     assignment = relationship("Assignment", back_populates="submissions")
     active_assignment = relationship("ActiveAssignment")
 
+    # A student's submission is identified by when it was made, so re-syncing it is a no-op
+    __table_args__ = (
+        UniqueConstraint("session_id", "student_id", "submitted_at", name="uq_student_submissions_session_student_time"),
+    )
+
 class ProbingQuestion(Base):
     __tablename__ = "probing_questions"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -78,7 +84,7 @@ class ProbingQuestion(Base):
     text = Column(Text, nullable=False)
     hint = Column(Text, nullable=True)
 
-    question = relationship("AssignmentQuestion")
+    question = relationship("AssignmentQuestion", back_populates="probing_questions")
 
     def to_dict(self):
         return {"text": self.text, "hint": self.hint}
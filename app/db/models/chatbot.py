@@ -0,0 +1,20 @@
+# backend/app/db/models/chatbot.py
+from sqlalchemy import Column, String, DateTime
+from datetime import datetime, timezone
+
+from app.db.models.assignment import Base
+
+class ChatbotConfigRecord(Base):
+    __tablename__ = "chatbot_configs"
+
+    chapter_id = Column(String, primary_key=True)
+    teacher_id = Column(String, nullable=False)
+    personality = Column(String, nullable=False)
+    tone = Column(String, nullable=False)
+    knowledge_source = Column(String, nullable=True)  # Chunk file of the retrieval index
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc)
+    )
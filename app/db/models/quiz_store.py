@@ -0,0 +1,37 @@
+# backend/app/db/models/quiz_store.py
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index, UniqueConstraint
+from datetime import datetime, timezone
+
+from app.db.models.assignment import Base
+
+class QuizStoreEntry(Base):
+    __tablename__ = "quiz_store"
+
+    namespace = Column(String, primary_key=True)  # "quizzes", "active_quizzes", "student_responses"
+    key = Column(String, primary_key=True)
+    value = Column(JSON, nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc)
+    )
+
+class QuizStoreItem(Base):
+    """One item of a list value built with ``QuizStore.append``, e.g. one student's response"""
+    __tablename__ = "quiz_store_items"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # Keeps items in append order
+    namespace = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    item_key = Column(String, nullable=False)  # e.g. the student_id within a quiz session
+    value = Column(JSON, nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc)
+    )
+
+    __table_args__ = (
+        UniqueConstraint("namespace", "key", "item_key", name="uq_quiz_store_items_item"),
+        Index("ix_quiz_store_items_namespace_key", "namespace", "key"),
+    )
@@ -0,0 +1,17 @@
+# backend/app/db/models/summary.py
+from sqlalchemy import Column, String, Integer, Text, DateTime
+from datetime import datetime, timezone
+
+from app.db.models.assignment import Base
+
+class SummaryCacheEntry(Base):
+    __tablename__ = "summary_cache"
+
+    content_hash = Column(String(64), primary_key=True)  # SHA-256 of the sanitized content
+    complexity = Column(String, primary_key=True)
+    mode = Column(String, primary_key=True)
+    prompt_version = Column(String, primary_key=True)
+    summary = Column(Text, nullable=False)
+    original_length = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
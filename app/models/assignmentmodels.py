@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from pydantic import BaseModel, EmailStr
 from typing import Dict, List, Optional, Any
 import uuid
@@ -26,7 +26,7 @@ class AssignmentResponse(BaseModel):
     answers: Dict[str, str]
     interactions: Dict[str, List[StudentInteraction]]
     time_spent: Dict[str, float]  # seconds per question
-    timestamp: datetime = datetime.now()
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))  # When the student submitted, set by the client
 
 class AssignmentQuestion(BaseModel):
     id: str
@@ -76,6 +76,18 @@ class GradedAssignmentResponse(BaseModel):
     total_questions: int
     feedback: Dict[str, FeedbackItem]
 
+class StudentGradeResult(BaseModel):
+    student_id: str
+    score: int
+    total_questions: int
+    feedback: Dict[str, FeedbackItem]
+
+class BulkGradedAssignmentResponse(BaseModel):
+    session_id: str
+    submitted: int
+    duplicates: int = 0  # Already stored by an earlier sync of the same submissions
+    results: List[StudentGradeResult]
+
 class TeacherSignup(BaseModel):
     name: str
     email: EmailStr
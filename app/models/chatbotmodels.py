@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+# Shared Chatbot Models
+class ChatbotConfig(BaseModel):
+    chapter_id: str
+    teacher_id: str
+    personality: str  # "formal", "friendly", "humorous", etc.
+    tone: str  # "encouraging", "strict", "casual"
+    knowledge_source: Optional[str] = None  # Chunk file of the retrieval index
+    created_at: datetime = Field(default_factory=datetime.now)
+
+    class Config:
+        from_attributes = True
+
+class ChatbotResponse(BaseModel):
+    response: str
+    sources: List[str] = []
@@ -0,0 +1,214 @@
+import hashlib
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+NUM_PERMUTATIONS = 32
+BANDS = 8  # LSH bands of NUM_PERMUTATIONS // BANDS rows each
+SHINGLE_SIZE = 3
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def _permutations(count: int) -> List[Tuple[int, int]]:
+    """Fixed (a, b) pairs for the hash family, identical in every worker"""
+    params = []
+    for i in range(count):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        a, b = struct.unpack("<QQ", digest)
+        params.append((a % (_MERSENNE_PRIME - 1) + 1, b % _MERSENNE_PRIME))
+    return params
+
+
+_PERMUTATIONS = _permutations(NUM_PERMUTATIONS)
+
+# Words that change what is being asked; two questions only share an answer
+# when they agree on these
+QUESTION_WORDS = frozenset("what whats why whys how hows when whens where wheres which who whos whom whose".split())
+NEGATIONS = frozenset("""
+not no never nor none neither nothing cannot cant dont doesnt didnt isnt arent wasnt werent
+wont wouldnt shouldnt couldnt hasnt havent hadnt
+""".split())
+
+_APOSTROPHE_RE = re.compile(r"['\u2019]")
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_question(question: str) -> str:
+    """Question folded for case, punctuation and whitespace; every word is kept"""
+    text = _APOSTROPHE_RE.sub("", question.lower())
+    return _NON_WORD_RE.sub(" ", text).strip()
+
+
+def question_markers(normalized: str) -> frozenset:
+    """Question words and negations of a normalized question"""
+    return frozenset(word for word in normalized.split() if word in QUESTION_WORDS or word in NEGATIONS)
+
+
+def minhash_signature(normalized: str) -> Tuple[int, ...]:
+    """MinHash of the character shingles of a normalized question"""
+    text = f" {normalized} "
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(max(len(text) - SHINGLE_SIZE + 1, 1))}
+    hashes = [
+        struct.unpack("<Q", hashlib.blake2b(shingle.encode(), digest_size=8).digest())[0]
+        for shingle in shingles
+    ]
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def estimated_similarity(left: Tuple[int, ...], right: Tuple[int, ...]) -> float:
+    return sum(1 for x, y in zip(left, right) if x == y) / len(left)
+
+
+def _bands(signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+    rows = len(signature) // BANDS
+    return [(band, signature[band * rows:(band + 1) * rows]) for band in range(BANDS)]
+
+
+@dataclass
+class CachedAnswer:
+    response: str
+    sources: List[str]
+
+
+@dataclass
+class _Entry:
+    chapter_id: str
+    normalized: str
+    markers: frozenset
+    signature: Tuple[int, ...]
+    version: str
+    answer: CachedAnswer
+    expires_at: float
+
+
+EntryKey = Tuple[str, str]
+
+
+class AnswerCache:
+    """Per-chapter cache of chatbot answers for repeated student questions.
+
+    Questions are matched on their normalized form first, then on MinHash
+    similarity of character shingles (via LSH buckets) so near-identical
+    phrasings share an answer. A similar match also needs the same question
+    words and negations, so "what is" never answers "why is" or "what is
+    not". Every entry records the chapter's source
+    version; a lookup with a different version is a miss, which invalidates
+    answers across workers as soon as a chapter's knowledge source or
+    personality changes. Entries expire after ``ttl`` seconds and the least
+    recently used are evicted beyond ``maxsize``.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, threshold: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: "OrderedDict[EntryKey, _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple[str, int, Tuple[int, ...]], Set[EntryKey]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def _remove(self, key: EntryKey) -> None:
+        entry = self._entries.pop(key)
+        for band, values in _bands(entry.signature):
+            bucket_key = (entry.chapter_id, band, values)
+            bucket = self._buckets.get(bucket_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[bucket_key]
+
+    def _live(self, key: EntryKey, version: str, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now or entry.version != version:
+            self._remove(key)
+            return None
+        return entry
+
+    def get(self, chapter_id: str, version: str, question: str) -> Optional[CachedAnswer]:
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live((chapter_id, normalized), version, now)
+            if entry is None:
+                markers = question_markers(normalized)
+                signature = minhash_signature(normalized)
+                best_score = 0.0
+                candidates = set()
+                for band, values in _bands(signature):
+                    candidates |= self._buckets.get((chapter_id, band, values), set())
+                for key in candidates:
+                    candidate = self._live(key, version, now)
+                    if candidate is None or candidate.markers != markers:
+                        continue
+                    score = estimated_similarity(signature, candidate.signature)
+                    if score >= self.threshold and score > best_score:
+                        entry, best_score = candidate, score
+                if entry is not None:
+                    self.similar_hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((chapter_id, entry.normalized))
+            self.hits += 1
+            return entry.answer
+
+    def set(self, chapter_id: str, version: str, question: str, answer: CachedAnswer) -> None:
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        key = (chapter_id, normalized)
+        entry = _Entry(
+            chapter_id=chapter_id,
+            normalized=normalized,
+            markers=question_markers(normalized),
+            signature=minhash_signature(normalized),
+            version=version,
+            answer=answer,
+            expires_at=time.monotonic() + self.ttl
+        )
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for band, values in _bands(entry.signature):
+                self._buckets.setdefault((chapter_id, band, values), set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_chapter(self, chapter_id: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == chapter_id]:
+                self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+answer_cache = AnswerCache(
+    maxsize=settings.ANSWER_CACHE_SIZE,
+    ttl=settings.ANSWER_CACHE_TTL_SECONDS,
+    threshold=settings.ANSWER_CACHE_SIMILARITY
+)
@@ -0,0 +1,81 @@
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Set
+
+from sqlalchemy import event
+
+from app.db.models.assignment import Assignment, AssignmentQuestion, ProbingQuestion
+
+logger = logging.getLogger(__name__)
+
+# Caches derived from an assignment's content register here and are told
+# whenever that content changes through the ORM in this process. Writes made
+# by other workers are not seen, so those caches also expire their entries.
+_callbacks: List[Callable[[str], None]] = []
+
+# question -> assignment, kept only while some cache (a "holder") still holds
+# data derived from the assignment
+_assignment_by_question: Dict[str, str] = {}
+_questions_by_assignment: Dict[str, Set[str]] = {}
+_holders_by_assignment: Dict[str, Set[str]] = {}
+_lock = threading.Lock()
+
+
+def on_assignment_changed(callback: Callable[[str], None]) -> Callable[[str], None]:
+    _callbacks.append(callback)
+    return callback
+
+
+def remember_questions(assignment_id, question_ids: Iterable, holder: str) -> None:
+    """Record question -> assignment so probing question edits can be traced back"""
+    assignment_id = str(assignment_id)
+    question_ids = {str(question_id) for question_id in question_ids}
+    with _lock:
+        _holders_by_assignment.setdefault(assignment_id, set()).add(holder)
+        _questions_by_assignment.setdefault(assignment_id, set()).update(question_ids)
+        for question_id in question_ids:
+            _assignment_by_question[question_id] = assignment_id
+
+
+def forget_questions(assignment_id, holder: str) -> None:
+    """``holder`` no longer caches the assignment; drop its questions once no cache does"""
+    assignment_id = str(assignment_id)
+    with _lock:
+        holders = _holders_by_assignment.get(assignment_id)
+        if holders is None:
+            return
+        holders.discard(holder)
+        if holders:
+            return
+        del _holders_by_assignment[assignment_id]
+        for question_id in _questions_by_assignment.pop(assignment_id, set()):
+            if _assignment_by_question.get(question_id) == assignment_id:
+                del _assignment_by_question[question_id]
+
+
+def notify_assignment_changed(assignment_id) -> None:
+    for callback in _callbacks:
+        try:
+            callback(str(assignment_id))
+        except Exception as e:
+            logger.error(f"Assignment invalidation callback failed: {str(e)}")
+
+
+def _assignment_changed(mapper, connection, target):
+    notify_assignment_changed(target.id)
+
+
+def _question_changed(mapper, connection, target):
+    notify_assignment_changed(target.assignment_id)
+
+
+def _probing_question_changed(mapper, connection, target):
+    assignment_id = _assignment_by_question.get(str(target.question_id))
+    if assignment_id:
+        notify_assignment_changed(assignment_id)
+
+
+for _event_name in ("after_insert", "after_update", "after_delete"):
+    event.listen(Assignment, _event_name, _assignment_changed)
+    event.listen(AssignmentQuestion, _event_name, _question_changed)
+    event.listen(ProbingQuestion, _event_name, _probing_question_changed)
@@ -4,11 +4,14 @@ from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta, timezone
 import os
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.concurrency import run_in_threadpool
 import uuid
 from pydantic import BaseModel
 from typing import Dict, List, Optional, Union
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.db.models.assignment import Teacher  # Assuming you have a `Teacher` model
 
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -57,13 +60,24 @@ def authenticate_teacher(db, email, password):
         return None
     return user
 
+async def get_teacher_by_email(db: AsyncSession, email: str) -> Optional[Teacher]:
+    result = await db.execute(select(Teacher).where(Teacher.email == email).limit(1))
+    return result.scalars().first()
+
+async def authenticate_teacher_async(db: AsyncSession, email, password):
+    user = await get_teacher_by_email(db, email)
+    # bcrypt is deliberately slow, keep it off the event loop
+    if not user or not await run_in_threadpool(verify_password, password, user.hashed_password):
+        return None
+    return user
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_teacher(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_teacher(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email = payload.get("sub")
@@ -72,7 +86,7 @@ def get_current_teacher(token: str = Depends(oauth2_scheme), db: Session = Depen
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    user = db.query(Teacher).filter(Teacher.email == email).first()
+    user = await get_teacher_by_email(db, email)
     if user is None:
         raise HTTPException(status_code=401, detail="Invalid token")
     return user
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.services.llm_gateway import llm_gateway
+from app.services.llm_scheduler import Priority
+from app.utils.cache import LRUCache
+from app.utils.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SUMMARY_PROMPT = (
+    "You maintain a running summary of a tutoring conversation between a student and "
+    "a teaching assistant. Merge the existing summary with the new exchanges into one "
+    "short paragraph. Keep what the student is working on, what they struggled with and "
+    "what has already been explained. Do not add anything that was not said."
+)
+
+
+class ChatSession:
+    """Server-side history of one student's conversation with a chapter's chatbot.
+
+    Recent turns are kept verbatim; once the history goes over the token budget
+    the oldest turns are folded into a rolling summary by ``compact``.
+    """
+
+    def __init__(self, chapter_id: str, student_id: Optional[str] = None):
+        self.chapter_id = chapter_id
+        self.student_id = student_id
+        self.summary = ""
+        self.turns: List[Dict[str, str]] = []
+        # Serializes turns and compaction so history is never read half-updated
+        self.lock = asyncio.Lock()
+
+    @property
+    def has_history(self) -> bool:
+        return bool(self.summary or self.turns)
+
+    def history(self) -> List[Dict[str, str]]:
+        """Chat messages that replay the conversation so far"""
+        messages = []
+        if self.summary:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation: {self.summary}"
+            })
+        return messages + self.turns
+
+    def record(self, question: str, answer: str) -> None:
+        self.turns.extend([
+            {"role": "user", "content": question},
+            {"role": "assistant", "content": answer}
+        ])
+
+    def history_tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(estimate_tokens(turn["content"]) for turn in self.turns)
+
+    def needs_compaction(self, budget: int) -> bool:
+        return self.history_tokens() > budget
+
+    async def compact(self, budget: int, keep_turns: int) -> None:
+        """Fold the oldest turns into the summary until the history fits ``budget``.
+
+        The last ``keep_turns`` question/answer pairs always stay verbatim. If
+        the summary request fails, the oldest turns are dropped instead so the
+        history stays bounded.
+        """
+        keep_messages = 2 * keep_turns
+        folded = []
+        while self.history_tokens() > budget and len(self.turns) > keep_messages:
+            folded.extend(self.turns[:2])
+            del self.turns[:2]
+        if not folded:
+            return
+
+        transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in folded)
+        try:
+            # The student's next turn waits on this, so it is interactive work
+            response = await llm_gateway.chat(
+                priority=Priority.INTERACTIVE_STUDENT,
+                model="gpt-4.1-nano",
+                messages=[
+                    {"role": "system", "content": HISTORY_SUMMARY_PROMPT},
+                    {"role": "user", "content": f"Existing summary:\n{self.summary or '(none)'}\n\nNew exchanges:\n{transcript}"}
+                ],
+                temperature=0.3,
+                max_tokens=settings.CHAT_SESSION_SUMMARY_TOKENS
+            )
+            self.summary = response.choices[0].message.content.strip()
+        except Exception as e:
+            logger.warning(f"Could not summarize chat history for chapter {self.chapter_id}: {str(e)}")
+
+
+class ChatSessionStore:
+    """Chat sessions keyed by (chapter_id, student_id), evicted after ``idle_ttl`` seconds unused"""
+
+    def __init__(self, maxsize: int, idle_ttl: int):
+        self.sessions = LRUCache(maxsize=maxsize, ttl=idle_ttl)
+        self._compactions: Set[asyncio.Task] = set()
+
+    def get(self, chapter_id: str, student_id: str) -> ChatSession:
+        key = (chapter_id, student_id)
+        session = self.sessions.get(key)
+        if session is None:
+            session = ChatSession(chapter_id, student_id)
+        # Re-setting on every access turns the TTL into an idle timeout
+        self.sessions.set(key, session)
+        return session
+
+    def reset(self, chapter_id: str, student_id: str) -> None:
+        self.sessions.pop((chapter_id, student_id))
+
+    def after_turn(self, session: ChatSession) -> None:
+        """Compact the session in the background if its history is over budget.
+
+        Runs after the answer has been delivered, so compaction never delays a
+        student's next first token unless they ask again before it finishes.
+        """
+        if not session.needs_compaction(settings.CHAT_SESSION_TOKEN_BUDGET):
+            return
+
+        async def run():
+            async with session.lock:
+                await session.compact(settings.CHAT_SESSION_TOKEN_BUDGET, settings.CHAT_SESSION_RECENT_TURNS)
+
+        task = asyncio.create_task(run())
+        self._compactions.add(task)
+        task.add_done_callback(self._compactions.discard)
+
+    def stats(self):
+        return {
+            "active_sessions": len(self.sessions),
+            "maxsize": self.sessions.maxsize,
+            "pending_compactions": len(self._compactions)
+        }
+
+
+chat_sessions = ChatSessionStore(
+    maxsize=settings.CHAT_SESSION_MAX,
+    idle_ttl=settings.CHAT_SESSION_IDLE_SECONDS
+)
@@ -0,0 +1,103 @@
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.crud.chatbot import get_chatbot_config
+from app.models.chatbotmodels import ChatbotConfig
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Personality templates
+PERSONALITY_PROMPTS = {
+    "formal": "You are a formal teaching assistant. Use professional language and maintain academic tone.",
+    "friendly": "You are a friendly teaching assistant. Be warm and approachable in your responses.",
+    "humorous": "You are a humorous teaching assistant. Use appropriate jokes and keep explanations light.",
+    "socratic": "You are a Socratic teaching assistant. Answer questions with guiding questions.",
+}
+
+TONE_MODIFIERS = {
+    "encouraging": "Always provide positive reinforcement and encouragement.",
+    "strict": "Be concise and direct. Focus on accuracy.",
+    "casual": "Use informal language as if talking to a peer.",
+}
+
+
+def build_system_prompt(personality: str, tone: str) -> str:
+    return (
+        f"{PERSONALITY_PROMPTS[personality]} "
+        f"{TONE_MODIFIERS[tone]} "
+        "You are assisting students with questions about their course material. "
+        "Base your answers strictly on the provided course content."
+    )
+
+
+@dataclass(frozen=True)
+class ResolvedChatbot:
+    """A chapter's chatbot config together with its precomputed system prompt"""
+    config: ChatbotConfig
+    system_prompt: str
+    # Changes whenever the knowledge source or prompt does, so cached answers can be checked against it
+    version: str
+
+
+def resolve_chatbot(config: ChatbotConfig) -> ResolvedChatbot:
+    system_prompt = build_system_prompt(config.personality, config.tone)
+    version = hashlib.sha256(
+        f"{config.knowledge_source or ''}\0{system_prompt}".encode("utf-8")
+    ).hexdigest()[:16]
+    return ResolvedChatbot(config, system_prompt, version)
+
+
+def default_chatbot(chapter_id: str) -> ResolvedChatbot:
+    """Chatbot used for chapters that have not been configured by a teacher"""
+    return resolve_chatbot(ChatbotConfig(
+        chapter_id=chapter_id,
+        teacher_id="default",
+        personality="friendly",
+        tone="encouraging"
+    ))
+
+
+# Cached marker for chapters without a stored config, so they don't hit the DB either
+_NOT_CONFIGURED = object()
+
+
+class ChatbotConfigCache:
+    """TTL cache of resolved chatbot configs keyed by chapter_id.
+
+    Keeps the per-question path off the database; a config saved in this
+    process replaces its entry immediately, other workers see it within ``ttl``.
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, db: AsyncSession, chapter_id: str) -> Optional[ResolvedChatbot]:
+        cached = self.memory.get(chapter_id)
+        if cached is None:
+            record = await get_chatbot_config(db, chapter_id)
+            cached = resolve_chatbot(ChatbotConfig.model_validate(record)) if record else _NOT_CONFIGURED
+            self.memory.set(chapter_id, cached)
+        return None if cached is _NOT_CONFIGURED else cached
+
+    def set(self, config: ChatbotConfig) -> ResolvedChatbot:
+        resolved = resolve_chatbot(config)
+        self.memory.set(config.chapter_id, resolved)
+        return resolved
+
+    def invalidate(self, chapter_id: str) -> None:
+        self.memory.pop(chapter_id)
+
+    def stats(self):
+        return self.memory.stats()
+
+
+chatbot_config_cache = ChatbotConfigCache(
+    maxsize=settings.CHATBOT_CONFIG_CACHE_SIZE,
+    ttl=settings.CHATBOT_CONFIG_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,342 @@
+import hashlib
+import io
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from PyPDF2 import PdfReader
+from docx import Document
+
+from app.core.config import settings
+from app.services.extraction_engine import extraction_engine
+from app.utils.cache import LRUCache
+from app.utils.tokens import CHARS_PER_TOKEN
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FILE_TYPES = ['.txt', '.pdf', '.docx']
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+
+PageRange = Tuple[Optional[int], Optional[int]]
+
+# Part of every extraction cache key; bump whenever extraction or sanitizing
+# changes its output so entries written by older code are no longer served
+EXTRACTION_VERSION = 3
+
+
+def sanitize_text(text: str) -> str:
+    """Clean and normalize text input"""
+    if not text:
+        return ""
+
+    # Remove problematic control characters but preserve paragraphs
+    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
+    # Normalize excessive whitespace but keep paragraph breaks
+    text = re.sub(r'(?<!\n)\n(?!\n)', ' ', text)  # Single newlines to space
+    text = re.sub(r'[ \t]+', ' ', text)  # Multiple spaces/tabs to single space
+    return text.strip()
+
+
+def resolve_char_budget(max_chars: Optional[int] = None, max_tokens: Optional[int] = None) -> Optional[int]:
+    """Combine a character and a token budget into a single character limit"""
+    limits = [limit for limit in (max_chars, max_tokens and max_tokens * CHARS_PER_TOKEN) if limit]
+    return min(limits) if limits else None
+
+
+# A vertical gap this much larger than the page's usual line spacing starts a new paragraph
+PARAGRAPH_GAP_RATIO = 1.5
+
+
+def extract_page_text(page) -> str:
+    """Text of one PDF page with a blank line between paragraphs.
+
+    PyPDF2 emits one newline per text line, so paragraph breaks are lost;
+    they are recovered from the vertical position of each text run. Pages
+    without usable positions come back as PyPDF2 extracts them.
+    """
+    runs = []  # (text, baseline y)
+
+    def visit(text, cm, tm, font_dict, font_size):
+        if text:
+            runs.append((text, tm[5] * cm[3] + cm[5]))
+
+    page.extract_text(visitor_text=visit)
+    drops = [prev[1] - run[1] for prev, run in zip(runs, runs[1:])]
+    line_drops = sorted(drop for drop in drops if drop > 0)
+    if not line_drops:
+        return page.extract_text()
+
+    line_spacing = line_drops[len(line_drops) // 2]
+    text = [runs[0][0]]
+    for (run, _), drop in zip(runs[1:], drops):
+        if drop > line_spacing * PARAGRAPH_GAP_RATIO and text[-1].endswith('\n'):
+            text.append('\n')
+        text.append(run)
+    return ''.join(text)
+
+
+def iter_pdf_pages(content: bytes, page_range: Optional[PageRange] = None) -> Iterator[str]:
+    """Yield the text of each PDF page lazily, optionally limited to a 1-based inclusive page range"""
+    reader = PdfReader(io.BytesIO(content))
+    page_count = len(reader.pages)
+    first, last = page_range or (1, page_count)
+    first = max(first or 1, 1)
+    last = min(last or page_count, page_count)
+
+    for index in range(first - 1, last):
+        page_text = extract_page_text(reader.pages[index])
+        if page_text:
+            yield page_text
+
+
+def iter_docx_paragraphs(content: bytes) -> Iterator[str]:
+    doc = Document(io.BytesIO(content))
+    for para in doc.paragraphs:
+        yield para.text
+
+
+def take_within_budget(parts: Iterable[str], max_chars: Optional[int] = None, separator: str = '\n') -> str:
+    """Join parts with ``separator``, pulling from the iterator only until ``max_chars`` is reached"""
+    taken = []
+    total = 0
+    for part in parts:
+        if taken:
+            part = separator + part
+        if max_chars is not None and total + len(part) >= max_chars:
+            taken.append(part[:max_chars - total])
+            break
+        taken.append(part)
+        total += len(part)
+    return ''.join(taken)
+
+
+def iter_text_parts(content: bytes, file_ext: str, page_range: Optional[PageRange] = None) -> Iterator[str]:
+    """Raw text of a document in reading order: PDF pages, DOCX paragraphs or the whole .txt file"""
+    if file_ext == '.pdf':
+        return iter_pdf_pages(content, page_range)
+    if file_ext == '.docx':
+        return iter_docx_paragraphs(content)
+    if file_ext == '.txt':
+        return iter([content.decode('utf-8', errors='ignore')])
+    raise ValueError(f"Unsupported file type: {file_ext}")
+
+
+# How sanitized parts are joined: every DOCX paragraph is a paragraph break,
+# which chunking relies on, while PDF pages continue the running text (a
+# sentence may span pages) and keep their own paragraph breaks
+PART_SEPARATORS = {'.pdf': ' ', '.docx': '\n\n', '.txt': ''}
+
+
+def extract_sanitized_text(
+    content: bytes,
+    file_ext: str,
+    max_chars: Optional[int] = None,
+    page_range: Optional[PageRange] = None
+) -> str:
+    """Extraction entry point executed inside the extraction process pool.
+
+    Each page or paragraph is sanitized before it counts towards ``max_chars``,
+    so the budget is filled with clean text, and the parts are then joined
+    with ``PART_SEPARATORS`` so paragraph breaks survive. Extraction stops as
+    soon as the budget is reached; ``page_range`` only applies to PDFs.
+    """
+    parts = iter_text_parts(content, file_ext, page_range)
+    try:
+        text = take_within_budget(
+            (part for part in map(sanitize_text, parts) if part),
+            max_chars,
+            PART_SEPARATORS[file_ext]
+        )
+    except Exception as e:
+        logger.error(f"{file_ext[1:].upper()} extraction failed: {str(e)}")
+        raise ValueError(f"Failed to extract text from {file_ext[1:].upper()}")
+    return text.rstrip()
+
+
+class ExtractedTextCache:
+    """Two-level cache of sanitized document text keyed by content hash.
+
+    Lookups hit an in-process LRU first and fall back to one text file per
+    key under ``cache_dir`` so repeat uploads survive restarts. Reads refresh
+    a file's mtime, and once the directory grows past ``max_bytes`` the least
+    recently used files are deleted, including entries of older extraction
+    versions that are no longer read.
+    """
+
+    # Prune down to this fraction of max_bytes so pruning doesn't run on every write
+    PRUNE_TARGET = 0.8
+
+    def __init__(self, cache_dir: str, maxsize: int = 64, max_bytes: Optional[int] = None):
+        self.cache_dir = Path(cache_dir)
+        self.memory = LRUCache(maxsize=maxsize)
+        self.max_bytes = max_bytes
+        self._disk_bytes: Optional[int] = None  # Estimate for this process, None until first scanned
+        self.pruned = 0
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.txt"
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        """(mtime, size, path) of every stored entry"""
+        entries = []
+        for path in self.cache_dir.glob("*.txt"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # Removed by another worker meanwhile
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _prune(self) -> None:
+        """Delete least recently used entries until the directory is under PRUNE_TARGET of max_bytes"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * self.PRUNE_TARGET
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+                self.pruned += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not prune extraction cache entry {path.name}: {str(e)}")
+                continue
+            total -= size
+        self._disk_bytes = total
+
+    def get(self, key: str) -> Optional[str]:
+        text = self.memory.get(key)
+        if text is not None:
+            return text
+
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Could not read extraction cache entry {key}: {str(e)}")
+            return None
+
+        try:
+            os.utime(path)  # Mark as recently used for pruning
+        except OSError:
+            pass
+        self.memory.set(key, text)
+        return text
+
+    def set(self, key: str, text: str) -> None:
+        self.memory.set(key, text)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Write to a temp file first so concurrent readers never see a partial entry
+            tmp_path = self._path(key).with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(text, encoding="utf-8")
+            os.replace(tmp_path, self._path(key))
+            if self.max_bytes is None:
+                return
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._disk_bytes += self._path(key).stat().st_size
+            if self._disk_bytes > self.max_bytes:
+                self._prune()
+        except OSError as e:
+            logger.warning(f"Could not persist extraction cache entry {key}: {str(e)}")
+
+
+extraction_cache = ExtractedTextCache(
+    settings.EXTRACTION_CACHE_DIR,
+    maxsize=settings.EXTRACTION_CACHE_SIZE,
+    max_bytes=settings.EXTRACTION_CACHE_MAX_BYTES
+)
+
+
+def content_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def cache_key(digest: str, max_chars: Optional[int] = None, page_range: Optional[PageRange] = None) -> str:
+    """Cache key for one extraction; a full, unbounded extraction is keyed by digest and version alone"""
+    key = f"{digest}-v{EXTRACTION_VERSION}"
+    if max_chars is None and page_range is None:
+        return key
+    first, last = page_range or (None, None)
+    return f"{key}-c{max_chars or 0}-p{first or 0}-{last or 0}"
+
+
+async def read_upload(file: UploadFile) -> tuple:
+    """Read and validate an upload, returning ``(contents, file_ext)``"""
+    file_ext = Path(file.filename or "").suffix.lower()
+    if file_ext not in ALLOWED_FILE_TYPES:
+        raise ValueError(f"Unsupported file type: {file_ext}")
+
+    contents = await file.read()
+    if len(contents) > MAX_FILE_SIZE:
+        raise ValueError(f"File exceeds maximum size of {MAX_FILE_SIZE} bytes")
+    return contents, file_ext
+
+
+async def ingest_upload(
+    file: UploadFile,
+    max_chars: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    page_range: Optional[PageRange] = None
+) -> str:
+    """Return sanitized text for an uploaded document, parsing it only once per content hash.
+
+    Parsing stops once the character/token budget is reached, so callers that
+    only need the first part of a long book never touch the remaining pages.
+    """
+    contents, file_ext = await read_upload(file)
+    return await ingest_contents(contents, file_ext, file.filename, max_chars, max_tokens, page_range)
+
+
+async def ingest_file(path: str) -> str:
+    """Sanitized full text of a document stored on disk, e.g. a previously saved upload"""
+    file_ext = Path(path).suffix.lower()
+    if file_ext not in ALLOWED_FILE_TYPES:
+        raise ValueError(f"Unsupported file type: {file_ext}")
+    contents = await run_in_threadpool(Path(path).read_bytes)
+    return await ingest_contents(contents, file_ext, path)
+
+
+async def ingest_contents(
+    contents: bytes,
+    file_ext: str,
+    name: Optional[str] = None,
+    max_chars: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    page_range: Optional[PageRange] = None
+) -> str:
+    """Sanitized text of a document's bytes, served from the extraction cache when possible"""
+    budget = resolve_char_budget(max_chars, max_tokens)
+    if file_ext != '.pdf':
+        page_range = None
+
+    digest = content_digest(contents)
+    key = cache_key(digest, budget, page_range)
+    full_key = cache_key(digest)
+    cached = extraction_cache.get(key)
+    if cached is None and key != full_key and page_range is None:
+        # A previous full extraction (e.g. a chatbot source) can serve any smaller
+        # budget, since budgets apply to the sanitized text
+        full_text = extraction_cache.get(full_key)
+        cached = full_text[:budget].rstrip() if full_text is not None else None
+    if cached is not None:
+        logger.info(f"Extraction cache hit for {name} ({digest[:12]})")
+        return cached
+
+    if file_ext == '.txt':
+        text = extract_sanitized_text(contents, file_ext, budget)
+    else:
+        # PDF/DOCX parsing is CPU-bound, keep it off the event loop
+        text = await extraction_engine.run(extract_sanitized_text, contents, file_ext, budget, page_range)
+    extraction_cache.set(key, text)
+    return text
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionError(Exception):
+    """Base class for failures of the extraction engine itself"""
+
+
+class ExtractionBusyError(ExtractionError):
+    """Raised when too many documents are already queued for extraction"""
+
+
+class ExtractionTimeoutError(ExtractionError):
+    """Raised when a single document takes longer than the configured timeout"""
+
+
+class ExtractionEngine:
+    """Bounded process pool for CPU-heavy document parsing.
+
+    Jobs are counted against ``max_queue`` from submission until the worker
+    actually finishes, so a document that timed out but is still being parsed
+    keeps occupying its slot and cannot be used to pile up work.
+    """
+
+    def __init__(self, max_workers: int, timeout: float, max_queue: int):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_queue = max_queue
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    @property
+    def queue_depth(self) -> int:
+        return self._pending
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        """Run a picklable top-level function in the pool and await its result"""
+        with self._lock:
+            if self._pending >= self.max_queue:
+                raise ExtractionBusyError("Document extraction queue is full, please retry shortly")
+            self._pending += 1
+
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a malformed PDF); start a fresh pool
+            logger.warning("Extraction pool was broken, recreating it")
+            self._executor = None
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except Exception:
+                self._release(None)
+                raise
+        except Exception:
+            self._release(None)
+            raise
+
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Document extraction timed out after {self.timeout}s")
+            raise ExtractionTimeoutError(f"Document extraction timed out after {self.timeout:.0f}s")
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+extraction_engine = ExtractionEngine(
+    max_workers=settings.EXTRACTION_WORKERS,
+    timeout=settings.EXTRACTION_TIMEOUT_SECONDS,
+    max_queue=settings.EXTRACTION_MAX_QUEUE
+)
@@ -0,0 +1,252 @@
+import json
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.db.models.assignment import ActiveAssignment, AssignmentQuestion
+from app.models.assignmentmodels import AssignmentResponse
+from app.services.assignment_invalidation import forget_questions, on_assignment_changed, remember_questions
+from app.utils.cache import LRUCache
+
+_WHITESPACE = re.compile(r'\s+')
+_FRACTION = re.compile(r'^(-?\d+(?:\.\d+)?)\s*/\s*(-?\d+(?:\.\d+)?)$')
+_THOUSANDS = re.compile(r'^-?\d{1,3}(?:,\d{3})+(?:\.\d+)?$')
+# Parts of a multi-part answer are separated by ';', new lines or commas that
+# are not thousands separators
+_PART_SEPARATOR = re.compile(r'\s*(?:[;\n]|,(?!\d{3}(?!\d)))\s*')
+_PART_LABEL = re.compile(r'^([a-z][\w ]*?)\s*[:=]\s*(.+)$')
+_ANSWER_KEYS = ("answer", "value", "text")
+
+
+def normalize_answer(value: Any) -> str:
+    """Case-fold, trim and collapse internal whitespace; ignore a trailing full stop"""
+    text = _WHITESPACE.sub(' ', str(value)).strip().lower()
+    return text[:-1].rstrip() if text.endswith('.') else text
+
+
+def parse_number(text: str) -> Optional[float]:
+    """Parse plain numbers, thousands separators and simple fractions like 3/4"""
+    candidate = text.strip()
+    if _THOUSANDS.match(candidate):
+        candidate = candidate.replace(',', '')
+    match = _FRACTION.match(candidate)
+    try:
+        if match:
+            denominator = float(match.group(2))
+            return float(match.group(1)) / denominator if denominator else None
+        number = float(candidate)
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _is_scalar(value: Any) -> bool:
+    return not isinstance(value, (list, dict))
+
+
+def _answer_parts(answer: Any, label: Optional[str] = None) -> List[Tuple[Optional[str], List[Any]]]:
+    """Split a JSONB answer into ``(label, accepted values)`` parts that must all be answered.
+
+    A scalar or a flat list of scalars is one part whose values are
+    alternatives. A dict with an answer key stands for that value; any other
+    dict has one part per key, labelled with the key. A list holding dicts or
+    lists (e.g. multi-step working) has one part per item, in order.
+    """
+    if answer is None:
+        return []
+    if _is_scalar(answer):
+        return [(label, [answer])]
+    if isinstance(answer, dict):
+        for key in _ANSWER_KEYS:
+            if key in answer:
+                return _answer_parts(answer[key], label)
+        parts = []
+        for key, value in answer.items():
+            parts.extend(_answer_parts(value, normalize_answer(key)))
+        return parts
+    if all(_is_scalar(item) for item in answer):
+        values = [item for item in answer if item is not None]
+        return [(label, values)] if values else []
+    parts = []
+    for item in answer:
+        parts.extend(_answer_parts(item))
+    return parts
+
+
+def _student_parts(student_answer: str) -> List[Tuple[Optional[str], str, str]]:
+    """Split a student's answer to a multi-part question into ``(label, value, piece)`` triples.
+
+    Accepts a JSON object or array, or text such as ``x = 2; y = 3``. ``piece``
+    is the whole normalized part, label included, for answers like ``x = 2``
+    that are themselves written as an equation.
+    """
+    try:
+        decoded = json.loads(student_answer)
+    except ValueError:
+        decoded = None
+    if isinstance(decoded, dict):
+        return [(normalize_answer(key), normalize_answer(value), normalize_answer(value)) for key, value in decoded.items()]
+    if isinstance(decoded, list):
+        return [(None, normalize_answer(value), normalize_answer(value)) for value in decoded]
+
+    parts = []
+    for piece in _PART_SEPARATOR.split(student_answer.strip()):
+        piece = normalize_answer(piece)
+        if not piece:
+            continue
+        match = _PART_LABEL.match(piece)
+        parts.append((match.group(1), match.group(2), piece) if match else (None, piece, piece))
+    return parts
+
+
+@dataclass(frozen=True)
+class CompiledPart:
+    label: Optional[str]
+    accepted: FrozenSet[str]
+    numeric: Tuple[float, ...]
+
+    @classmethod
+    def compile(cls, label: Optional[str], values: Iterable[Any]) -> "CompiledPart":
+        accepted = frozenset(normalize_answer(value) for value in values)
+        numeric = tuple(
+            number for number in (parse_number(text) for text in accepted) if number is not None
+        )
+        return cls(label=label, accepted=accepted, numeric=numeric)
+
+    def matches(self, normalized: str, tolerance: float) -> bool:
+        if normalized in self.accepted:
+            return True
+        if self.numeric:
+            number = parse_number(normalized)
+            if number is not None:
+                return any(
+                    math.isclose(number, expected, rel_tol=tolerance, abs_tol=tolerance)
+                    for expected in self.numeric
+                )
+        return False
+
+
+@dataclass(frozen=True)
+class CompiledQuestion:
+    id: str
+    text: str
+    parts: Tuple[CompiledPart, ...]
+
+    def is_correct(self, student_answer: Optional[str], tolerance: float) -> bool:
+        if student_answer is None or not self.parts:
+            return False
+        if len(self.parts) == 1:
+            return self.parts[0].matches(normalize_answer(student_answer), tolerance)
+
+        given = _student_parts(str(student_answer))
+        if len(given) != len(self.parts):
+            return False
+        labels = {part.label: part for part in self.parts}
+        if None not in labels and len(labels) == len(self.parts) and all(label in labels for label, _, _ in given):
+            # Every part is named, e.g. "x = 2; y = 3", so order doesn't matter
+            return len({label for label, _, _ in given}) == len(given) and all(
+                labels[label].matches(value, tolerance) for label, value, _ in given
+            )
+        return all(
+            part.matches(value, tolerance) or part.matches(piece, tolerance)
+            for part, (_, value, piece) in zip(self.parts, given)
+        )
+
+
+@dataclass(frozen=True)
+class CompiledAnswerKey:
+    assignment_id: str
+    questions: Tuple[CompiledQuestion, ...]
+    tolerance: float
+
+    def grade(self, response: AssignmentResponse) -> Tuple[int, Dict[str, Dict], Dict[str, Dict]]:
+        """Grade one submission in a single pass; returns (score, feedback, interaction_analysis)"""
+        score = 0
+        feedback = {}
+        interaction_analysis = {}
+
+        for question in self.questions:
+            q_id = question.id
+            student_answer = response.answers.get(q_id)
+
+            is_correct = question.is_correct(student_answer, self.tolerance)
+            if is_correct:
+                score += 1
+
+            interactions_list = response.interactions.get(q_id, [])
+            analysis = {
+                "hints_used": sum(1 for i in interactions_list if i.type == "hint_used"),
+                "probing_engaged": len(interactions_list),
+                "time_spent": response.time_spent.get(q_id, 0)
+            }
+            interaction_analysis[q_id] = analysis
+
+            feedback[q_id] = {
+                "correct": is_correct,
+                "student_answer": student_answer,
+                "question_text": question.text,
+                "interaction_analysis": analysis
+            }
+
+        return score, feedback, interaction_analysis
+
+
+def compile_answer_key(assignment_id, questions: List[AssignmentQuestion]) -> CompiledAnswerKey:
+    compiled = []
+    for question in questions:
+        compiled.append(CompiledQuestion(
+            id=str(question.id),
+            text=question.text,
+            parts=tuple(CompiledPart.compile(label, values) for label, values in _answer_parts(question.answer))
+        ))
+    return CompiledAnswerKey(
+        assignment_id=str(assignment_id),
+        questions=tuple(compiled),
+        tolerance=settings.GRADING_NUMERIC_TOLERANCE
+    )
+
+
+class AnswerKeyCache:
+    """Compiled answer keys per assignment, plus the (immutable) session -> assignment mapping.
+
+    Keys are dropped when the assignment changes in this process and expire
+    after ``ttl`` so edits made by another worker are picked up.
+    """
+
+    HOLDER = "answer_keys"
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self._keys = LRUCache(maxsize=maxsize, ttl=ttl, on_evict=self._evicted)
+        self._assignment_by_session = LRUCache(maxsize=maxsize * 4)
+
+    def get_for_session(self, session_id: str) -> Optional[CompiledAnswerKey]:
+        assignment_id = self._assignment_by_session.get(str(session_id))
+        return self._keys.get(assignment_id) if assignment_id else None
+
+    def compile(self, active_assignment: ActiveAssignment) -> CompiledAnswerKey:
+        """Compile and cache the key for a session whose assignment questions are loaded"""
+        assignment = active_assignment.assignment
+        answer_key = compile_answer_key(assignment.id, assignment.questions)
+        remember_questions(assignment.id, (q.id for q in assignment.questions), self.HOLDER)
+        self._keys.set(answer_key.assignment_id, answer_key)
+        self._assignment_by_session.set(str(active_assignment.session_id), answer_key.assignment_id)
+        return answer_key
+
+    def _evicted(self, assignment_id: str, answer_key: CompiledAnswerKey) -> None:
+        forget_questions(assignment_id, self.HOLDER)
+
+    def invalidate_assignment(self, assignment_id: str) -> None:
+        self._keys.pop(str(assignment_id))
+        forget_questions(assignment_id, self.HOLDER)
+
+    def stats(self):
+        return self._keys.stats()
+
+
+answer_key_cache = AnswerKeyCache(
+    maxsize=settings.ANSWER_KEY_CACHE_SIZE,
+    ttl=settings.ASSIGNMENT_CACHE_TTL_SECONDS
+)
+on_assignment_changed(answer_key_cache.invalidate_assignment)
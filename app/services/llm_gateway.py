@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import httpx
+import openai
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, RateLimitError
+
+from app.core.config import settings
+from app.services.llm_scheduler import LLMScheduler, Priority
+from app.utils.tokens import CHARS_PER_TOKEN
+
+logger = logging.getLogger(__name__)
+
+# Worth retrying: dropped connections and timeouts, rate limits and server-side errors
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+# Completion budget assumed for calls that don't set max_tokens
+DEFAULT_COMPLETION_TOKENS = 500
+
+
+def estimate_tokens(kwargs: Dict[str, Any]) -> int:
+    """Rough prompt plus completion tokens of a chat request, for rate limiting"""
+    prompt_chars = sum(len(str(message.get("content") or "")) for message in kwargs.get("messages", []))
+    return prompt_chars // CHARS_PER_TOKEN + (kwargs.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+def request_key(kwargs: Dict[str, Any]) -> str:
+    """Identity of a chat request: model, messages, temperature, response_format and any other options"""
+    return hashlib.sha256(json.dumps(kwargs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, APIConnectionError):  # Includes APITimeoutError
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+class LLMGateway:
+    """Single entry point for OpenAI chat completions.
+
+    Owns one pooled HTTP client with keep-alive and explicit timeouts and
+    retries transient failures with exponential backoff and full jitter. Every
+    call first waits for a slot from the scheduler, which caps concurrency,
+    applies the request/token rate limits and serves callers by ``priority``,
+    round-robin across ``tenant`` (teacher) within a class. Identical
+    non-streaming requests of the same class and tenant that overlap in time
+    share a single upstream call.
+    The client is created on first use so importing this module does no
+    network setup.
+    """
+
+    def __init__(
+        self,
+        scheduler: LLMScheduler,
+        max_retries: int,
+        retry_base: float,
+        retry_max: float,
+        connect_timeout: float,
+        read_timeout: float,
+        max_connections: int,
+        max_keepalive: int
+    ):
+        self.scheduler = scheduler
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self._client: Optional[AsyncOpenAI] = None
+        self._pending: Dict[str, asyncio.Task] = {}
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.coalesced = 0
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            timeout = httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=60.0
+            )
+            self._client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                timeout=timeout,
+                max_retries=0,  # Retries are handled here, inside the scheduler slot
+                http_client=openai.DefaultAsyncHttpxClient(timeout=timeout, limits=limits)
+            )
+        return self._client
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+        if isinstance(error, RateLimitError):
+            retry_after = error.response.headers.get("retry-after")
+            try:
+                delay = max(delay, min(float(retry_after), self.retry_max))
+            except (TypeError, ValueError):
+                pass
+        return delay
+
+    async def _call(self, request: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``request`` with retries; the caller holds a scheduler slot"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await request()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    self.failures += 1
+                    raise
+                delay = self._backoff(attempt, e)
+                self.retries += 1
+                logger.warning(f"LLM call failed ({type(e).__name__}), retry {attempt + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def chat(
+        self,
+        priority: Priority = Priority.INTERACTIVE_TEACHER,
+        tenant: Optional[str] = None,
+        **kwargs
+    ) -> Any:
+        """``chat.completions.create`` through the shared client.
+
+        If an identical request from the same priority class and tenant is
+        already in flight, this awaits its result instead of making another
+        call; requests are never shared across classes or tenants, so a student
+        never waits in a teacher's background queue. The shared call runs as its
+        own task, so one caller going away (e.g. a closed connection) doesn't
+        cancel it for the others. Callers get the same response object and must
+        not mutate it.
+        """
+        key = request_key({"priority": int(priority), "tenant": tenant, **kwargs})
+        task = self._pending.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._chat(priority, tenant, kwargs))
+            self._pending[key] = task
+            task.add_done_callback(lambda done: self._finish_pending(key, done))
+        return await asyncio.shield(task)
+
+    def _finish_pending(self, key: str, task: asyncio.Task) -> None:
+        if self._pending.get(key) is task:
+            del self._pending[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved in case every caller was cancelled
+
+    async def _chat(self, priority: Priority, tenant: Optional[str], kwargs: Dict[str, Any]) -> Any:
+        async with self.scheduler.slot(priority, tenant, estimate_tokens(kwargs)):
+            self.in_flight += 1
+            self.calls += 1
+            try:
+                return await self._call(lambda: self.client.chat.completions.create(**kwargs))
+            finally:
+                self.in_flight -= 1
+
+    async def stream_chat(
+        self,
+        priority: Priority = Priority.INTERACTIVE_TEACHER,
+        tenant: Optional[str] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Streamed chat completion yielding content deltas.
+
+        Only opening the stream is retried; once tokens have been yielded a
+        failure propagates to the caller. The scheduler slot is held until the
+        stream is finished.
+        """
+        async with self.scheduler.slot(priority, tenant, estimate_tokens(kwargs)):
+            self.in_flight += 1
+            self.calls += 1
+            try:
+                stream = await self._call(
+                    lambda: self.client.chat.completions.create(stream=True, **kwargs)
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "coalesced": self.coalesced,
+            "scheduler": self.scheduler.stats()
+        }
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+llm_gateway = LLMGateway(
+    LLMScheduler(
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE
+    ),
+    max_retries=settings.LLM_MAX_RETRIES,
+    retry_base=settings.LLM_RETRY_BASE_SECONDS,
+    retry_max=settings.LLM_RETRY_MAX_SECONDS,
+    connect_timeout=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+    read_timeout=settings.LLM_READ_TIMEOUT_SECONDS,
+    max_connections=settings.LLM_MAX_CONNECTIONS,
+    max_keepalive=settings.LLM_MAX_KEEPALIVE_CONNECTIONS
+)
@@ -0,0 +1,160 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+
+class Priority(IntEnum):
+    """LLM call classes, dispatched strictly in this order"""
+    INTERACTIVE_STUDENT = 0  # Students waiting in a live class: hints, chatbot
+    INTERACTIVE_TEACHER = 1  # A teacher waiting on screen: summaries, quizzes
+    BACKGROUND = 2           # Bulk generation: assignments, probing questions
+
+
+class TokenBucket:
+    """Refills ``rate_per_minute`` units per minute up to one minute's worth.
+
+    A rate of 0 disables the bucket.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self.tokens = float(rate_per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` is available; 0 if it can be taken now"""
+        if not self.rate:
+            return 0.0
+        self._refill(time.monotonic())
+        # A request larger than the whole bucket is let through once it is full
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def take(self, amount: float) -> None:
+        if self.rate:
+            self.tokens -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ("future", "cost")
+
+    def __init__(self, future: asyncio.Future, cost: int):
+        self.future = future
+        self.cost = cost
+
+
+class LLMScheduler:
+    """Grants LLM call slots by priority, fairly across tenants, within rate limits.
+
+    Waiters of a higher priority class are always dispatched before lower
+    ones. Within a class each tenant (teacher) has its own FIFO and tenants are
+    served round-robin, so one teacher's 20-question assignment cannot starve
+    another's. A slot is granted only while fewer than ``max_concurrency``
+    calls are running and the request and token buckets can cover the call.
+    """
+
+    def __init__(self, max_concurrency: int, requests_per_minute: int, tokens_per_minute: int):
+        self.max_concurrency = max_concurrency
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.running = 0
+        self._queues: List["OrderedDict[Optional[str], Deque[_Waiter]]"] = [OrderedDict() for _ in Priority]
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.dispatched = [0 for _ in Priority]
+        self.throttled = 0
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        """Head of the best queue without removing it, dropping cancelled waiters"""
+        for queues in self._queues:
+            while queues:
+                tenant, waiters = next(iter(queues.items()))
+                while waiters and waiters[0].future.done():
+                    waiters.popleft()
+                if waiters:
+                    return waiters[0]
+                del queues[tenant]
+        return None
+
+    def _pop_waiter(self) -> None:
+        """Remove the head returned by ``_next_waiter`` and rotate its tenant to the back"""
+        for priority, queues in enumerate(self._queues):
+            if queues:
+                tenant, waiters = queues.popitem(last=False)
+                waiters.popleft()
+                if waiters:
+                    queues[tenant] = waiters
+                self.dispatched[priority] += 1
+                return
+
+    def _dispatch(self) -> None:
+        self._timer = None
+        while self.running < self.max_concurrency:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            wait = max(self.request_bucket.wait_time(1), self.token_bucket.wait_time(waiter.cost))
+            if wait > 0:
+                # Over the rate limit: hold everything back so the head keeps its place
+                self.throttled += 1
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            self.request_bucket.take(1)
+            self.token_bucket.take(waiter.cost)
+            self._pop_waiter()
+            self.running += 1
+            waiter.future.set_result(None)
+
+    def _release(self) -> None:
+        self.running -= 1
+        if self._timer is None:
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        priority: Priority = Priority.INTERACTIVE_TEACHER,
+        tenant: Optional[str] = None,
+        cost: int = 0
+    ) -> AsyncIterator[None]:
+        """Wait for permission to make one LLM call estimated at ``cost`` tokens"""
+        future = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(tenant, deque()).append(_Waiter(future, cost))
+        if self._timer is None:
+            self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the caller was cancelled; hand the slot back
+                self._release()
+            raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {
+            priority.name.lower(): sum(
+                sum(1 for waiter in waiters if not waiter.future.done())
+                for waiters in self._queues[priority].values()
+            )
+            for priority in Priority
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "max_concurrency": self.max_concurrency,
+            "queued": self.queue_depths(),
+            "dispatched": {priority.name.lower(): self.dispatched[priority] for priority in Priority},
+            "throttled": self.throttled
+        }
@@ -1,19 +1,27 @@
+import asyncio
+import logging
 import openai
 import re
 from typing import List, Dict, Optional
 import uuid
 import json
-from openai import AsyncOpenAI
 from app.core.config import settings
+from app.services.llm_gateway import llm_gateway
+from app.services.llm_scheduler import Priority
 from app.db.models.assignment import AssignmentQuestion, ProbingQuestion
 import os
 
+logger = logging.getLogger(__name__)
 
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+PROBING_GUIDELINES = """GUIDELINES:
+    1. Create questions that reveal underlying concepts
+    2. Include questions that address common mistakes
+    3. Progress from simple to complex
+    4. Use Socratic questioning techniques
+    5. Make questions specific to this problem"""
 
 class LLMAssignmentService:
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         self.system_prompt = """You are an expert educational content creator. 
         Generate assignments that progressively build understanding through:
         1. Conceptual questions
@@ -27,7 +35,8 @@ class LLMAssignmentService:
         difficulty: str,
         question_count: int,
         class_grade: Optional[str] = None,
-        context: str = ""
+        context: str = "",
+        teacher_id: Optional[str] = None
     ) -> Dict:
         """Generate core assignment questions with JSON response"""
         prompt = f"""Create a {difficulty} level assignment for {class_grade} students on '{title}' ({subject}).
@@ -50,7 +59,10 @@ class LLMAssignmentService:
             ]
         }}"""
         
-        response = await self.client.chat.completions.create(
+        # Bulk generation yields to student traffic; teacher_id keeps teachers' jobs interleaved
+        response = await llm_gateway.chat(
+            priority=Priority.BACKGROUND,
+            tenant=teacher_id,
             model="gpt-4.1-nano",
             messages=[
                 {"role": "system", "content": self.system_prompt},
@@ -73,7 +85,8 @@ class LLMAssignmentService:
         self,
         main_question: str,
         correct_answer: str,
-        subject: str
+        subject: str,
+        teacher_id: Optional[str] = None
     ) -> List[ProbingQuestion]:
         """Generate scaffolding questions for a main question"""
         prompt = f"""You are an expert {subject} tutor. Create 3-4 high-quality probing questions that help students work through this problem step by step.
@@ -84,12 +97,7 @@ class LLMAssignmentService:
     TARGET ANSWER:
     {correct_answer}
 
-    GUIDELINES:
-    1. Create questions that reveal underlying concepts
-    2. Include questions that address common mistakes
-    3. Progress from simple to complex
-    4. Use Socratic questioning techniques
-    5. Make questions specific to this problem
+    {PROBING_GUIDELINES}
 
     FORMAT REQUIREMENTS:
     - Return ONLY a numbered list of questions
@@ -102,7 +110,9 @@ class LLMAssignmentService:
     3. What units should your final answer have?"""
 
         try:
-            response = await self.client.chat.completions.create(
+            response = await llm_gateway.chat(
+                priority=Priority.BACKGROUND,
+                tenant=teacher_id,
                 model="gpt-4-turbo",  # or your preferred model
                 messages=[
                     {"role": "system", "content": "You are a Socratic tutor that creates excellent probing questions."},
@@ -135,6 +145,114 @@ class LLMAssignmentService:
             print(f"ERROR in probing generation: {str(e)}")
             return []
 
+    async def generate_probing_questions_batch(
+        self,
+        questions: List[Dict],
+        subject: str,
+        teacher_id: Optional[str] = None
+    ) -> Dict[str, List[ProbingQuestion]]:
+        """Generate probing questions for all questions of an assignment in one request.
+
+        ``questions`` are dicts with ``id``, ``text`` and ``answer``. Any question
+        missing or malformed in the batch output falls back to its own
+        ``generate_probing_questions`` call. Returns question id -> probing questions.
+        """
+        if not questions:
+            return {}
+
+        questions_block = "\n\n".join(
+            f"QUESTION ID: {q['id']}\nMAIN QUESTION:\n{q['text']}\nTARGET ANSWER:\n{q['answer']}"
+            for q in questions
+        )
+        prompt = f"""You are an expert {subject} tutor. For EACH main question below, create 3-4 high-quality probing questions that help students work through that problem step by step.
+
+    {PROBING_GUIDELINES}
+
+    {questions_block}
+
+    Return the response in JSON format exactly like this, with one entry per QUESTION ID:
+    {{
+        "probing_questions": {{
+            "<question id>": ["first probing question", "second probing question", "third probing question"]
+        }}
+    }}"""
+
+        parsed: Dict[str, List[ProbingQuestion]] = {}
+        try:
+            response = await llm_gateway.chat(
+                priority=Priority.BACKGROUND,
+                tenant=teacher_id,
+                model="gpt-4-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a Socratic tutor that creates excellent probing questions."},
+                    {"role": "user", "content": prompt}
+                ],
+                response_format={"type": "json_object"},
+                temperature=0.5,
+                max_tokens=min(4096, 250 * len(questions) + 200)
+            )
+            data = json.loads(response.choices[0].message.content)
+            batch = data.get("probing_questions", {}) if isinstance(data, dict) else {}
+            for q in questions:
+                probing = self._probing_from_batch_entry(batch.get(str(q['id'])))
+                if probing:
+                    parsed[str(q['id'])] = probing
+        except Exception as e:
+            logger.exception(f"Batch probing generation failed: {str(e)}")
+
+        missing = [q for q in questions if str(q['id']) not in parsed]
+        if missing:
+            logger.debug(f"Falling back to per-question probing for {len(missing)} question(s)")
+            parsed.update(await self._generate_probing_questions_individually(missing, subject, teacher_id))
+        return parsed
+
+    def _probing_from_batch_entry(self, entry) -> List[ProbingQuestion]:
+        """Validate one question's entry from the batch output; returns [] if malformed"""
+        if not isinstance(entry, list):
+            return []
+        questions = []
+        for item in entry:
+            if isinstance(item, dict):
+                text, hint = item.get("text"), item.get("hint")
+            else:
+                text, hint = item, None
+            if not isinstance(text, str) or not text.strip():
+                return []
+            questions.append(ProbingQuestion(
+                id=str(uuid.uuid4()),
+                text=re.sub(r'^(\d+\.\s*|-\s*)', '', text.strip()),
+                hint=hint or "Think about this step carefully"
+            ))
+        return questions[:4]
+
+    async def _generate_probing_questions_individually(
+        self,
+        questions: List[Dict],
+        subject: str,
+        teacher_id: Optional[str] = None
+    ) -> Dict[str, List[ProbingQuestion]]:
+        """Per-question probing generation, bounded by PROBING_CONCURRENCY"""
+        semaphore = asyncio.Semaphore(settings.PROBING_CONCURRENCY)
+
+        async def generate_for_question(q: Dict) -> List[ProbingQuestion]:
+            async with semaphore:
+                return await self.generate_probing_questions(q['text'], q['answer'], subject, teacher_id)
+
+        results = await asyncio.gather(
+            *(generate_for_question(q) for q in questions),
+            return_exceptions=True
+        )
+
+        generated = {}
+        for q, probing in zip(questions, results):
+            # A failure for one question must not affect the others
+            if isinstance(probing, Exception):
+                logger.error(f"Probing generation failed for question {q['id']}: {str(probing)}", exc_info=probing)
+                continue
+            if probing:
+                generated[str(q['id'])] = probing
+        return generated
+
     def _parse_probing_questions(self, text: str) -> List[ProbingQuestion]:
         """Convert LLM response to ProbingQuestion objects with proper regex handling"""
         questions = []
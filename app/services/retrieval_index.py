@@ -0,0 +1,278 @@
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 2
+
+# Common English function words; they carry no signal for BM25 ranking
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers herself him himself his how i if in into is it its itself
+just me more most my myself no nor not now of off on once only or other our ours ourselves out
+over own same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when where which
+while who whom why will with would you your yours yourself yourselves
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens with stopwords and single characters removed"""
+    return [
+        token for token in _TOKEN_RE.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def chunk_text(text: str, chunk_chars: int, overlap: int) -> List[Tuple[int, int]]:
+    """Split ``text`` into overlapping windows, returned as ``(start, end)`` offsets.
+
+    Windows end on a paragraph, sentence or word boundary where one is close
+    enough, so chunks rarely cut a sentence in half.
+    """
+    spans = []
+    start, length = 0, len(text)
+    while start < length:
+        end = min(start + chunk_chars, length)
+        if end < length:
+            floor = start + chunk_chars // 2
+            for separator in ("\n\n", ". ", " "):
+                cut = text.rfind(separator, floor, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+        if text[start:end].strip():
+            spans.append((start, end))
+        if end >= length:
+            break
+        # Step back for overlap, then forward to the next word so chunks start cleanly
+        next_start = max(end - overlap, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return spans
+
+
+class ChunkFile:
+    """Read-only view of chunk texts stored back to back in one UTF-8 file.
+
+    The file is memory-mapped and ``offsets`` holds the byte span of each
+    chunk, so fetching a chunk is a slice and a decode with no parsing.
+    """
+
+    def __init__(self, path: Path, offsets: List[List[int]]):
+        self.path = path
+        self.offsets = offsets
+        self._mmap = None
+        if offsets:
+            with open(path, "rb") as f:
+                # The mapping stays valid after the file object is closed
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def write(path: Path, chunks: Sequence[str]) -> List[List[int]]:
+        """Write ``chunks`` to ``path`` and return their byte offsets"""
+        offsets = []
+        position = 0
+        with open(path, "wb") as f:
+            for chunk in chunks:
+                data = chunk.encode("utf-8")
+                f.write(data)
+                offsets.append([position, position + len(data)])
+                position += len(data)
+        return offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, chunk_id: int) -> str:
+        start, end = self.offsets[chunk_id]
+        return self._mmap[start:end].decode("utf-8")
+
+
+class BM25Index:
+    """Okapi BM25 over the chunks of one chapter's knowledge source"""
+
+    def __init__(
+        self,
+        chunks: Sequence[str],
+        postings: Dict[str, List[List[int]]],
+        doc_lengths: List[int],
+        source: Optional[str] = None,
+        k1: float = 1.5,
+        b: float = 0.75
+    ):
+        self.chunks = chunks
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.source = source
+        self.k1 = k1
+        self.b = b
+        self.avg_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+        total = len(doc_lengths)
+        self.idf = {
+            term: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+
+    @classmethod
+    def build(cls, chunks: List[str], source: Optional[str] = None) -> "BM25Index":
+        postings: Dict[str, List[List[int]]] = {}
+        doc_lengths = []
+        for doc_id, chunk in enumerate(chunks):
+            terms = Counter(tokenize(chunk))
+            doc_lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                postings.setdefault(term, []).append([doc_id, frequency])
+        return cls(chunks, postings, doc_lengths, source=source)
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Return up to ``k`` ``(chunk_id, score)`` pairs, best first"""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf[term]
+            for doc_id, frequency in docs:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:k]
+
+    def to_dict(self, chunk_file: str, offsets: List[List[int]]) -> Dict[str, Any]:
+        return {
+            "version": INDEX_FORMAT_VERSION,
+            "source": self.source,
+            "k1": self.k1,
+            "b": self.b,
+            "chunk_file": chunk_file,
+            "offsets": offsets,
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], index_dir: Path) -> "BM25Index":
+        if data.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported index version: {data.get('version')}")
+        return cls(
+            ChunkFile(index_dir / data["chunk_file"], data["offsets"]),
+            data["postings"],
+            data["doc_lengths"],
+            source=data.get("source"),
+            k1=data["k1"],
+            b=data["b"]
+        )
+
+
+class RetrievalIndexStore:
+    """Per-chapter BM25 indexes persisted under ``index_dir``.
+
+    Each chapter has a JSON file with the postings and chunk offsets, plus a
+    chunk text file named after its content hash that is memory-mapped at
+    load time. Loaded indexes are kept in an LRU and reloaded when the JSON
+    file on disk is newer, so a rebuild from another worker is picked up on
+    the next question.
+    """
+
+    def __init__(self, index_dir: str, maxsize: int = 64):
+        self.index_dir = Path(index_dir)
+        self.memory = LRUCache(maxsize=maxsize)
+
+    def _path(self, chapter_id: str) -> Path:
+        safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", chapter_id)
+        return self.index_dir / f"{safe_id}.json"
+
+    def build(self, chapter_id: str, text: str, source: Optional[str] = None) -> BM25Index:
+        """Chunk ``text``, index it and persist the result for ``chapter_id``"""
+        spans = chunk_text(text, settings.CHATBOT_CHUNK_CHARS, settings.CHATBOT_CHUNK_OVERLAP)
+        chunks = [text[start:end].strip() for start, end in spans]
+        index = BM25Index.build(chunks, source=source)
+
+        path = self._path(chapter_id)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        previous_chunk_file = self._chunk_file_name(path)
+
+        # Chunk files are named by content, so readers holding the previous
+        # index keep a consistent pair until they reload
+        digest = hashlib.sha256("\0".join(chunks).encode("utf-8")).hexdigest()[:16]
+        chunk_file = f"{path.stem}.{digest}.chunks"
+        offsets = ChunkFile.write(self.index_dir / chunk_file, chunks)
+
+        # Write to a temp file first so concurrent readers never see a partial index
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(index.to_dict(chunk_file, offsets)), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+        if previous_chunk_file and previous_chunk_file != chunk_file:
+            # Existing mappings of the old file stay readable after unlink
+            (self.index_dir / previous_chunk_file).unlink(missing_ok=True)
+
+        index = BM25Index.from_dict(json.loads(path.read_text(encoding="utf-8")), self.index_dir)
+        self.memory.set(chapter_id, (path.stat().st_mtime_ns, index))
+        logger.info(f"Indexed {len(index.chunks)} chunks for chapter {chapter_id}")
+        return index
+
+    @staticmethod
+    def _chunk_file_name(path: Path) -> Optional[str]:
+        try:
+            return json.loads(path.read_text(encoding="utf-8")).get("chunk_file")
+        except (OSError, ValueError):
+            return None
+
+    def load(self, chapter_id: str) -> Optional[BM25Index]:
+        path = self._path(chapter_id)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self.memory.pop(chapter_id)
+            return None
+
+        cached = self.memory.get(chapter_id)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        try:
+            index = BM25Index.from_dict(json.loads(path.read_text(encoding="utf-8")), self.index_dir)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load retrieval index for chapter {chapter_id}: {str(e)}")
+            return None
+        self.memory.set(chapter_id, (mtime, index))
+        return index
+
+    def delete(self, chapter_id: str) -> None:
+        """Remove the chapter's index and chunk file, e.g. when its source is cleared"""
+        path = self._path(chapter_id)
+        chunk_file = self._chunk_file_name(path)
+        path.unlink(missing_ok=True)
+        if chunk_file:
+            (self.index_dir / chunk_file).unlink(missing_ok=True)
+        self.memory.pop(chapter_id)
+
+    def search(self, chapter_id: str, query: str, k: Optional[int] = None) -> List[Tuple[int, str]]:
+        """Top-``k`` ``(chunk_id, text)`` pairs for ``query``; empty if the chapter has no index"""
+        index = self.load(chapter_id)
+        if index is None:
+            return []
+        hits = index.search(query, k or settings.CHATBOT_TOP_K)
+        return [(chunk_id, index.chunks[chunk_id]) for chunk_id, _ in hits]
+
+
+retrieval_indexes = RetrievalIndexStore(
+    settings.CHATBOT_INDEX_DIR,
+    maxsize=settings.CHATBOT_INDEX_CACHE_SIZE
+)
@@ -0,0 +1,99 @@
+import threading
+from typing import Dict, Optional, Set
+
+from app.core.config import settings
+from app.db.models.assignment import ActiveAssignment
+from app.models.assignmentmodels import GeneratedAssignment, ProbingQuestion as ProbingQuestionSchema
+from app.services.assignment_invalidation import forget_questions, on_assignment_changed, remember_questions
+from app.utils.cache import LRUCache
+
+
+def build_session_payload(active_assignment: ActiveAssignment) -> bytes:
+    """Serialize the student view of a published assignment.
+
+    Expects the assignment, its questions and their probing questions to be
+    loaded already (see get_active_assignment_with_content).
+    """
+    assignment = active_assignment.assignment
+    questions = assignment.questions
+    payload = GeneratedAssignment(
+        assignment_id=str(assignment.id),
+        session_id=str(active_assignment.session_id),
+        title=assignment.title,
+        subject=assignment.subject,
+        questions=[
+            {
+                "id": str(q.id),
+                "text": q.text,
+                "answer": q.answer,
+                "explanation": q.explanation,
+                "type": q.type
+            } for q in questions
+        ],
+        probing_questions={
+            str(q.id): [ProbingQuestionSchema.from_orm(pq) for pq in q.probing_questions]
+            for q in questions
+        },
+        status="active",
+        question_count=len(questions)
+    )
+    return payload.model_dump_json().encode("utf-8")
+
+
+class SessionPayloadCache:
+    """Bounded cache of serialized session payloads, keyed by session id.
+
+    Published content is immutable, so the payload is built once and then
+    served as raw bytes. All sessions of an assignment are dropped when the
+    assignment, its questions or their probing questions change in this
+    process; edits made by another worker are picked up once ``ttl`` expires.
+    """
+
+    HOLDER = "session_payloads"
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        # session_id -> (assignment_id, payload)
+        self._payloads = LRUCache(maxsize=maxsize, ttl=ttl, on_evict=self._evicted)
+        self._sessions_by_assignment: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[bytes]:
+        entry = self._payloads.get(str(session_id))
+        return entry[1] if entry else None
+
+    def set(self, active_assignment: ActiveAssignment, payload: bytes) -> None:
+        session_id = str(active_assignment.session_id)
+        assignment_id = str(active_assignment.assignment_id)
+        remember_questions(assignment_id, (q.id for q in active_assignment.assignment.questions), self.HOLDER)
+        with self._lock:
+            self._sessions_by_assignment.setdefault(assignment_id, set()).add(session_id)
+        self._payloads.set(session_id, (assignment_id, payload))
+
+    def _evicted(self, session_id: str, entry) -> None:
+        assignment_id = entry[0]
+        with self._lock:
+            session_ids = self._sessions_by_assignment.get(assignment_id)
+            if session_ids is None:
+                return
+            session_ids.discard(session_id)
+            if session_ids:
+                return
+            del self._sessions_by_assignment[assignment_id]
+        forget_questions(assignment_id, self.HOLDER)
+
+    def invalidate_assignment(self, assignment_id: str) -> None:
+        with self._lock:
+            session_ids = self._sessions_by_assignment.pop(str(assignment_id), set())
+        for session_id in session_ids:
+            self._payloads.pop(session_id)
+        forget_questions(assignment_id, self.HOLDER)
+
+    def stats(self):
+        return self._payloads.stats()
+
+
+session_payload_cache = SessionPayloadCache(
+    maxsize=settings.SESSION_PAYLOAD_CACHE_SIZE,
+    ttl=settings.ASSIGNMENT_CACHE_TTL_SECONDS
+)
+on_assignment_changed(session_payload_cache.invalidate_assignment)
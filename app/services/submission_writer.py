@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.crud.async_assignment import save_student_submissions_bulk
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class SubmissionWriter:
+    """Write-behind persistence for graded student submissions.
+
+    Rows go onto a bounded in-process queue and a background task inserts
+    them with one multi-row INSERT per batch, flushing every
+    ``flush_interval`` seconds or as soon as ``batch_size`` rows are waiting.
+    ``enqueue`` returns False when the writer is not running or the queue is
+    full, and the caller should then save synchronously. Batches that cannot
+    be written are appended to ``spill_path`` so they can be replayed instead
+    of being lost.
+    """
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval: float, spill_path: str):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = Path(spill_path)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._batch: List[Dict[str, Any]] = []  # Rows taken off the queue but not yet flushed
+        self._current_flush: Optional[asyncio.Future] = None
+        self.flushed = 0
+        self.batches = 0
+        self.spilled = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+        logger.info("Submission write-behind started")
+
+    def enqueue(self, row: Dict[str, Any]) -> bool:
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except asyncio.QueueFull:
+            logger.warning("Submission queue full, falling back to a direct write")
+            return False
+
+    async def _fill_batch(self) -> None:
+        self._batch.append(await self._queue.get())
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+        while len(self._batch) < self.batch_size:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                self._batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self) -> None:
+        while True:
+            await self._fill_batch()
+            batch, self._batch = self._batch, []
+            # Shield the write so stopping the writer never abandons a batch mid-insert
+            self._current_flush = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._current_flush)
+
+    async def _flush(self, rows: List[Dict[str, Any]]) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                await save_student_submissions_bulk(db, rows)
+            self.flushed += len(rows)
+            self.batches += 1
+        except Exception:
+            # Anything, including a malformed row, must not end the writer loop
+            logger.exception(f"Failed to write {len(rows)} submissions")
+            self._spill(rows)
+
+    def _spill(self, rows: List[Dict[str, Any]]) -> None:
+        try:
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.spill_path.open("a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, default=str) + "\n")
+            self.spilled += len(rows)
+            logger.error(f"Spilled {len(rows)} submissions to {self.spill_path}")
+        except Exception as e:
+            logger.critical(f"Could not spill {len(rows)} submissions, they are lost: {str(e)}")
+
+    async def stop(self) -> None:
+        """Stop the background task and durably drain whatever is still queued"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._current_flush is not None and not self._current_flush.done():
+            await self._current_flush
+
+        remaining, self._batch = self._batch, []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        for start in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[start:start + self.batch_size])
+        logger.info(f"Submission write-behind stopped, drained {len(remaining)} queued submissions")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.running,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "spilled": self.spilled
+        }
+
+
+submission_writer = SubmissionWriter(
+    max_queue=settings.SUBMISSION_QUEUE_MAX,
+    batch_size=settings.SUBMISSION_BATCH_SIZE,
+    flush_interval=settings.SUBMISSION_FLUSH_INTERVAL_SECONDS,
+    spill_path=settings.SUBMISSION_SPILL_PATH
+)
@@ -0,0 +1,140 @@
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.db.models.summary import SummaryCacheEntry
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the summary prompts change so stale summaries are not served
+SUMMARY_PROMPT_VERSION = "v1"
+
+CacheKey = Tuple[str, str, str, str]
+
+
+class SummaryCache:
+    """Summaries keyed by (content hash, complexity, mode, prompt version).
+
+    An in-memory LRU with TTL sits in front of the ``summary_cache`` table so
+    repeat requests for the same chapter skip both the LLM and the database.
+    Rows expire after ``db_ttl`` seconds: expired rows are never served, and
+    writes delete them at most once every ``PURGE_INTERVAL`` seconds so the
+    table stays bounded. The database layer is best effort: errors are logged
+    and treated as misses.
+    """
+
+    PURGE_INTERVAL = 60 * 60
+
+    def __init__(self, maxsize: int, ttl: int, db_ttl: int):
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.db_ttl = db_ttl
+        self._next_purge = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.db_hits = 0
+        self.db_purged = 0
+
+    @staticmethod
+    def make_key(content: str, complexity: str, mode: str) -> CacheKey:
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        return (content_hash, complexity, mode, SUMMARY_PROMPT_VERSION)
+
+    def _load(self, key: CacheKey) -> Optional[str]:
+        db = SessionLocal()
+        try:
+            content_hash, complexity, mode, prompt_version = key
+            return db.execute(
+                select(SummaryCacheEntry.summary).where(
+                    SummaryCacheEntry.content_hash == content_hash,
+                    SummaryCacheEntry.complexity == complexity,
+                    SummaryCacheEntry.mode == mode,
+                    SummaryCacheEntry.prompt_version == prompt_version,
+                    SummaryCacheEntry.expires_at > datetime.now(timezone.utc)
+                )
+            ).scalar_one_or_none()
+        finally:
+            db.close()
+
+    def _store(self, key: CacheKey, summary: str, original_length: int) -> None:
+        content_hash, complexity, mode, prompt_version = key
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=self.db_ttl)
+        statement = insert(SummaryCacheEntry).values(
+            content_hash=content_hash,
+            complexity=complexity,
+            mode=mode,
+            prompt_version=prompt_version,
+            summary=summary,
+            original_length=original_length,
+            created_at=now,
+            expires_at=expires_at
+        ).on_conflict_do_update(
+            index_elements=["content_hash", "complexity", "mode", "prompt_version"],
+            set_={"summary": summary, "created_at": now, "expires_at": expires_at}
+        )
+        db = SessionLocal()
+        try:
+            db.execute(statement)
+            if time.monotonic() >= self._next_purge:
+                self._next_purge = time.monotonic() + self.PURGE_INTERVAL
+                purged = db.execute(delete(SummaryCacheEntry).where(SummaryCacheEntry.expires_at <= now))
+                self.db_purged += purged.rowcount
+            db.commit()
+        finally:
+            db.close()
+
+    async def get(self, content: str, complexity: str, mode: str) -> Optional[str]:
+        key = self.make_key(content, complexity, mode)
+        summary = self.memory.get(key)
+        if summary is None:
+            try:
+                summary = await run_in_threadpool(self._load, key)
+            except SQLAlchemyError as e:
+                logger.warning(f"Summary cache lookup failed: {str(e)}")
+                summary = None
+            if summary is not None:
+                self.db_hits += 1
+                self.memory.set(key, summary)
+
+        if summary is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return summary
+
+    async def set(self, content: str, complexity: str, mode: str, summary: str) -> None:
+        key = self.make_key(content, complexity, mode)
+        self.memory.set(key, summary)
+        try:
+            await run_in_threadpool(self._store, key, summary, len(content))
+        except SQLAlchemyError as e:
+            logger.warning(f"Summary cache write failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "db_hits": self.db_hits,
+            "db_purged": self.db_purged,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "memory": self.memory.stats(),
+            "prompt_version": SUMMARY_PROMPT_VERSION
+        }
+
+
+summary_cache = SummaryCache(
+    maxsize=settings.SUMMARY_CACHE_SIZE,
+    ttl=settings.SUMMARY_CACHE_TTL_SECONDS,
+    db_ttl=settings.SUMMARY_CACHE_DB_TTL_SECONDS
+)
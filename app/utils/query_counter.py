@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """Collects the SQL statements executed on an engine while attached"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine) -> Iterator[QueryCounter]:
+    """
+    Count the queries issued on ``engine`` (sync or async) inside the block:
+
+        with count_queries(async_engine) as counter:
+            await get_assignment_session(session_id, db)
+        print(counter.count)
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    counter = QueryCounter()
+    event.listen(sync_engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", counter)
+
+
+@contextmanager
+def assert_max_queries(engine, max_count: int) -> Iterator[QueryCounter]:
+    """Fail if the block issues more than ``max_count`` queries, e.g. to catch N+1 regressions per endpoint"""
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > max_count:
+        executed = "\n".join(f"  {i + 1}. {sql}" for i, sql in enumerate(counter.statements))
+        raise AssertionError(f"Expected at most {max_count} queries, got {counter.count}:\n{executed}")
@@ -0,0 +1,6 @@
+CHARS_PER_TOKEN = 4  # Rough average for English text with OpenAI tokenizers
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of ``text``, for budgets and rate limiting"""
+    return len(text) // CHARS_PER_TOKEN + 1
@@ -2,6 +2,10 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.services.extraction_engine import extraction_engine
+from app.database import async_engine
+from app.services.submission_writer import submission_writer
+from app.services.llm_gateway import llm_gateway
 
 
 def create_app() -> FastAPI:
@@ -18,6 +22,10 @@ def create_app() -> FastAPI:
     async def root():
         return {"status": "Aacharya backend is live 🚀"}
 
+    @app.get("/metrics/llm", tags=["Health Check"])
+    async def llm_metrics():
+        return llm_gateway.stats()
+
     # CORS settings (add production domain later)
     app.add_middleware(
         CORSMiddleware,
@@ -36,6 +44,18 @@ def create_app() -> FastAPI:
     # Add API routes
     app.include_router(api_router, prefix=settings.API_V1_STR)
 
+    @app.on_event("startup")
+    async def start_workers():
+        if settings.SUBMISSION_WRITE_BEHIND:
+            await submission_writer.start()
+
+    @app.on_event("shutdown")
+    async def shutdown_workers():
+        await submission_writer.stop()
+        extraction_engine.shutdown()
+        await llm_gateway.aclose()
+        await async_engine.dispose()
+
     return app
 
 
@@ -0,0 +1,122 @@
+"""Check that the assignment read paths issue a fixed number of queries.
+
+Seeds an assignment inside a transaction on DATABASE_URL (migrations must be
+applied), calls each endpoint with a small and a large assignment under
+``assert_max_queries`` and rolls everything back, so nothing is left behind.
+Fails with the executed SQL if an endpoint goes over its budget, e.g. after
+an N+1 regression:
+
+    python -m scripts.check_query_counts
+"""
+import asyncio
+import uuid
+
+from app.api.v1.endpoints.assignments import (
+    get_assignment_session,
+    get_submissions,
+    get_teacher_submission_detail
+)
+from app.database import AsyncSessionLocal, SessionLocal, async_engine, engine
+from app.db.models.assignment import (
+    ActiveAssignment,
+    Assignment,
+    AssignmentQuestion,
+    ProbingQuestion,
+    StudentSubmission,
+    Teacher
+)
+from app.utils.query_counter import assert_max_queries
+
+# Session, assignment, questions and probing questions
+SESSION_QUERIES = 4
+# Assignment with teacher, then submissions
+SUBMISSIONS_QUERIES = 2
+# Submission with assignment, then questions
+SUBMISSION_DETAIL_QUERIES = 2
+
+SIZES = (2, 20)  # Questions (and submissions) per seeded assignment
+
+
+def seed(question_count: int):
+    """Objects for one published assignment with probing questions and submissions"""
+    teacher = Teacher(id=uuid.uuid4(), name="Query Check", email=f"{uuid.uuid4().hex}@example.com", hashed_password="-")
+    assignment = Assignment(
+        id=uuid.uuid4(),
+        title="Query count check",
+        subject="math",
+        question_count=question_count,
+        status="active",
+        teacher_id=teacher.id
+    )
+    questions = [
+        AssignmentQuestion(id=uuid.uuid4(), assignment_id=assignment.id, text=f"Q{i}", answer=str(i), question_order=i)
+        for i in range(question_count)
+    ]
+    probing = [
+        ProbingQuestion(question_id=question.id, text=f"Why {j}?", hint=None)
+        for question in questions for j in range(3)
+    ]
+    active = ActiveAssignment(session_id=uuid.uuid4(), assignment_id=assignment.id, teacher_id=str(teacher.id))
+    submissions = [
+        StudentSubmission(
+            id=uuid.uuid4(),
+            assignment_id=assignment.id,
+            session_id=active.session_id,
+            student_id=f"student-{i}",
+            score=0,
+            answers_json="{}",
+            interactions_json="{}",
+            time_spent_json="{}"
+        )
+        for i in range(question_count)
+    ]
+    return [teacher, assignment, *questions, *probing, active, *submissions], active, submissions[0]
+
+
+async def check_async_routes(question_count: int) -> None:
+    objects, active, _ = seed(question_count)
+    async with AsyncSessionLocal() as db:
+        try:
+            db.add_all(objects)
+            await db.flush()
+            # Drop the identity map so the endpoints really load from the database
+            db.expunge_all()
+
+            # A fresh process has an empty payload cache, so this takes the DB path
+            with assert_max_queries(async_engine, SESSION_QUERIES) as counter:
+                await get_assignment_session(str(active.session_id), db)
+            print(f"get_assignment_session ({question_count} questions): {counter.count} queries")
+
+            with assert_max_queries(async_engine, SUBMISSIONS_QUERIES) as counter:
+                await get_submissions(active.assignment_id, db)
+            print(f"get_submissions ({question_count} submissions): {counter.count} queries")
+        finally:
+            await db.rollback()
+
+
+def check_sync_routes(question_count: int) -> None:
+    objects, _, submission = seed(question_count)
+    db = SessionLocal()
+    try:
+        db.add_all(objects)
+        db.flush()
+        db.expunge_all()
+
+        with assert_max_queries(engine, SUBMISSION_DETAIL_QUERIES) as counter:
+            get_teacher_submission_detail(str(submission.id), db)
+        print(f"get_teacher_submission_detail ({question_count} questions): {counter.count} queries")
+    finally:
+        db.rollback()
+        db.close()
+
+
+async def main() -> None:
+    for question_count in SIZES:
+        await check_async_routes(question_count)
+        check_sync_routes(question_count)
+    await async_engine.dispose()
+    print("Query counts OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())